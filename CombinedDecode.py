@@ -2,8 +2,8 @@ from PIL import Image
 import numpy as np
 import struct   #Decode binary string
 import math
-import png  #To read/write 16-bit sample images
 import io   #For virtual files
+from fourier_steg import pngio  #To read/write 16-bit sample images
 
 ##################Basic breakdown##################
 '''
@@ -96,18 +96,12 @@ mag_img_array = np.hstack(mag_img_array)
 
 #Write the phase to a temp file
 phase_png_file = io.BytesIO()
-pngWriter = png.Writer(
-    column_count, row_count, greyscale=False, alpha=False, bitdepth=16
-)
-pngWriter.write(phase_png_file, phase_img_array)
+pngio.write_rgb16(phase_png_file, phase_img_array)
 
 
 #Write the magnitude to a temp file
 mag_png_file = io.BytesIO()
-pngWriter = png.Writer(
-    column_count, row_count, greyscale=False, alpha=False, bitdepth=16
-)
-pngWriter.write(mag_png_file, mag_img_array)
+pngio.write_rgb16(mag_png_file, mag_img_array)
 
 #Seek to the start of both files so we can open them later
 phase_png_file.seek(0)
@@ -117,18 +111,12 @@ mag_png_file.seek(0)
 if(output_intermediate_steps):
     #Write the phase to a temp file
     phase_png_file_output = open("Phase_Decoded.png", "wb")
-    pngWriter = png.Writer(
-        column_count, row_count, greyscale=False, alpha=False, bitdepth=16
-    )
-    pngWriter.write(phase_png_file_output, phase_img_array)
+    pngio.write_rgb16(phase_png_file_output, phase_img_array)
 
 
     #Write the magnitude to a temp file
     mag_png_file_output = open("Magnitude_Decoded.png", "wb")
-    pngWriter = png.Writer(
-        column_count, row_count, greyscale=False, alpha=False, bitdepth=16
-    )
-    pngWriter.write(mag_png_file_output, mag_img_array)
+    pngio.write_rgb16(mag_png_file_output, mag_img_array)
 
     #Seek to the start of both files so we can open them later
     phase_png_file.seek(0)
@@ -141,10 +129,8 @@ if(output_intermediate_steps):
 ################READ DATA FROM FOURIER SPACE IMAGE##################
 #Get image data from above magnitude file
 file = mag_png_file
-pngReader=png.Reader(file)
-
-row_count, column_count, pngdata, meta = pngReader.asDirect()
-image_2d = np.vstack(list(map(np.uint16, pngdata)))
+image_2d = pngio.read_rgb16(file)   #(rows, columns*3) samples in RGBRGB... order
+row_count, column_count = image_2d.shape[0], image_2d.shape[1]//3
 
 #Read the actual data
 payload_data = ""
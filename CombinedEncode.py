@@ -1,8 +1,8 @@
 from PIL import Image
 import numpy as np
 import math
-import png  #To read/write 16-bit sample images
 import io   #For virtual files
+from fourier_steg import pngio, transform   #pngio reads/writes the 16-bit sample images
 
 ##################Basic breakdown##################
 '''
@@ -14,9 +14,9 @@ ensure it affects the image as little as possible. Then this edited magnitude
 Fourier component is decoded using the inverse Fourier transform to get our
 edited image with the payload inside.
 
-The cover image ***must be square and have even resolution on both axis.***
-Imagemagick has the same limitations and just stretches images such that
-they're square. I think this is due to the maths from the Fourier itself.
+The cover image can be any size, rectangular or odd on either axis. Earlier
+versions needed square, even covers, that was only width and height being
+mixed up in a few places.
 
 
 Note that to see detail in the Fourier domain images you'll need
@@ -110,18 +110,12 @@ mag_img_array = np.hstack(mag_img_array)
 
 #Write the phase to a temp file
 phase_png_file = io.BytesIO()
-pngWriter = png.Writer(
-    column_count, row_count, greyscale=False, alpha=False, bitdepth=16
-)
-pngWriter.write(phase_png_file, phase_img_array)
+pngio.write_rgb16(phase_png_file, phase_img_array)
 
 
 #Write the magnitude to a temp file
 mag_png_file = io.BytesIO()
-pngWriter = png.Writer(
-    column_count, row_count, greyscale=False, alpha=False, bitdepth=16
-)
-pngWriter.write(mag_png_file, mag_img_array)
+pngio.write_rgb16(mag_png_file, mag_img_array)
 
 #Seek to the start of both files so we can open them later
 phase_png_file.seek(0)
@@ -131,18 +125,12 @@ mag_png_file.seek(0)
 if(output_intermediate_steps):
     #Write the phase to a temp file
     phase_png_file_output = open("Phase.png", "wb")
-    pngWriter = png.Writer(
-        column_count, row_count, greyscale=False, alpha=False, bitdepth=16
-    )
-    pngWriter.write(phase_png_file_output, phase_img_array)
+    pngio.write_rgb16(phase_png_file_output, phase_img_array)
 
 
     #Write the magnitude to a temp file
     mag_png_file_output = open("Magnitude_pre_edit.png", "wb")
-    pngWriter = png.Writer(
-        column_count, row_count, greyscale=False, alpha=False, bitdepth=16
-    )
-    pngWriter.write(mag_png_file_output, mag_img_array)
+    pngio.write_rgb16(mag_png_file_output, mag_img_array)
 
     #Close the files and seek back to the start
     phase_png_file_output.close()
@@ -155,9 +143,8 @@ if(output_intermediate_steps):
 ################ADD PAYLOAD DATA TO THE FOURIER SPACE IMAGE##################
 #Load the temp magnitude file from above and get its size and pixels
 file = mag_png_file
-pngReader=png.Reader(file)
-row_count, column_count, pngdata, meta = pngReader.asDirect()
-image_2d = np.vstack(list(map(np.uint16, pngdata)))
+image_2d = pngio.read_rgb16(file)   #(rows, columns*3) samples in RGBRGB... order
+row_count, column_count = image_2d.shape[0], image_2d.shape[1]//3
 
 
 #Convert payload text to binary string
@@ -206,19 +193,13 @@ for i, payload_bit in enumerate(TextList):
 
 #Write the edited magnitude with our payload to a temp file
 mag_img_with_payload = io.BytesIO()
-pngWriter = png.Writer(
-    column_count, row_count, greyscale=False, alpha=False, bitdepth=16
-)
-pngWriter.write(mag_img_with_payload, image_2d)
+pngio.write_rgb16(mag_img_with_payload, image_2d)
 mag_img_with_payload.seek(0)    #Seek to start of file to read later
 
 
 if(output_intermediate_steps):
     mag_img_with_payload_output = open("Magnitude_post_edit.png", "wb")
-    pngWriter = png.Writer(
-        column_count, row_count, greyscale=False, alpha=False, bitdepth=16
-    )
-    pngWriter.write(mag_img_with_payload_output, image_2d)
+    pngio.write_rgb16(mag_img_with_payload_output, image_2d)
     mag_img_with_payload_output.close()
     mag_img_with_payload.seek(0)    #Seek to start of file to read later
 
@@ -230,17 +211,8 @@ fin_mag = mag_img_with_payload
 
 
 ####Load each RGB channel from the image as greyscale####
-pngReader_phase = png.Reader(fin_phase)
-pngReader_mag = png.Reader(fin_mag)
-
-phase_row_count, phase_column_count, phase_pngdata, phase_meta = pngReader_phase.asDirect()
-phase_image_2d = np.vstack(list(map(np.uint16, phase_pngdata)))
-phase_image_2d = np.concatenate(phase_image_2d)
-
-
-mag_row_count, mag_column_count, mag_pngdata, mag_meta = pngReader_mag.asDirect()
-mag_image_2d = np.vstack(list(map(np.uint16, mag_pngdata)))
-mag_image_2d = np.concatenate(mag_image_2d)
+phase_image_2d = pngio.read_rgb16(fin_phase).reshape(-1)
+mag_image_2d = pngio.read_rgb16(fin_mag).reshape(-1)
 
 
 #Seperate the image data into [RRR],[BBB],[GGG] instead of RGBRGBRGBRGB for seperate treatment
@@ -262,43 +234,22 @@ phase_image_g = (2*np.pi*(phase_image_g/65535)) - np.pi
 phase_image_b = (2*np.pi*(phase_image_b/65535)) - np.pi
 
 #Combine these into an array of complex numbers for each channel#
-red_fshift = (mag_image_r*np.exp(1j*phase_image_r)).reshape(row_count,column_count)
-green_fshift = (mag_image_g*np.exp(1j*phase_image_g)).reshape(row_count,column_count)
-blue_fshift = (mag_image_b*np.exp(1j*phase_image_b)).reshape(row_count,column_count)
-
-
-#Unshift these back to numpy order#
-red_f = np.fft.ifftshift(red_fshift)
-green_f = np.fft.ifftshift(green_fshift)
-blue_f = np.fft.ifftshift(blue_fshift)
-
-#Do the inverse 2D FFT to get the image pixels back
-img_r_array = np.fft.ifft2(red_f)
-img_g_array = np.fft.ifft2(green_f)
-img_b_array = np.fft.ifft2(blue_f)
-
+fshift = np.stack((
+    mag_image_r*np.exp(1j*phase_image_r),
+    mag_image_g*np.exp(1j*phase_image_g),
+    mag_image_b*np.exp(1j*phase_image_b),
+)).reshape(3,row_count,column_count)
 
-#Perform inverse FFT to get image data back
-img_r_array = np.fft.ifft2(red_f)
-img_g_array = np.fft.ifft2(green_f)
-img_b_array = np.fft.ifft2(blue_f)
 
-#We need to manually round each pixel and limit it's range to 0-255 here before casting to uint8
-#Otherwise due to quantization errors it could be outside the range
-img_r_array = np.uint8(np.clip(np.round(np.abs(img_r_array.real)),0,255))
-img_g_array = np.uint8(np.clip(np.round(np.abs(img_g_array.real)),0,255))
-img_b_array = np.uint8(np.clip(np.round(np.abs(img_b_array.real)),0,255))
+#Perform inverse FFT once for all channels to get image data back
+img_planes = transform.inverse(fshift)
 
-#Merge the seperate RGB channels together for the final image in the format RGBRGBRGB#
-img_rgb = np.dstack(( img_r_array, img_g_array,img_b_array )).ravel()
-img_rgb = img_rgb.reshape(column_count,row_count*3)
+#Round each pixel straight into the final image, then view it in the format RGBRGBRGB#
+img_rgb = transform.to_image(img_planes)
 
 #Write the combined RGB channels to the final payload image
 with open("ImageWithPayload.png", "wb") as out:
-    pngWriter = png.Writer(
-        row_count, column_count, greyscale=False, alpha=False, bitdepth=8
-    )
-    pngWriter.write(out, img_rgb)
+    pngio.write_rgb8(out, img_rgb)
 
 
 print("Finished...")
@@ -0,0 +1,202 @@
+from PIL import Image
+import numpy as np
+import argparse
+import datetime
+import io
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fourier_steg import backends, core, ecc, metrics, planner, pngio, transform
+
+##################Basic breakdown##################
+'''
+Times the encode and decode pipelines on synthetic covers across a range of
+image sizes and payload sizes, one stage at a time, and writes the results
+as JSON so runs from different commits can be compared:
+
+    python benchmarks/bench_pipeline.py --sizes 256 1024 4096 --out bench.json
+
+Stage times inside encode()/decode() come from their metrics events so they
+measure the real pipeline. Load, PNG write, spectrum quantization and
+the Reed-Solomon codec are also timed on their own. Each case runs in a
+fresh process so its peak RSS isn't hidden by an earlier, larger case.
+
+Payloads go up to MAX_FILL of the planner's capacity, past that the
+synthetic cover no longer decodes reliably and decode() would be timing its
+ECC failure path. Any case that still doesn't round trip is listed under
+"failed" rather than in the results.
+'''
+
+DEFAULT_SIZES = (256, 512, 1024, 2048, 4096)
+MAX_FILL = 0.4  #Share of the capacity the payload sweep goes up to, 256x256 stops decoding at 0.5
+
+
+####Synthetic inputs####
+def synthetic_cover(size, seed=0):
+    #Smooth colour gradients plus noise, enough texture for the encoder's noise estimate
+    rng = np.random.default_rng(seed)
+    y, x = np.mgrid[0:size, 0:size] / size
+    base = np.stack((
+        128 + 60*np.sin(x*30) + 40*np.cos(y*22),
+        128 + 50*np.cos((x+y)*16),
+        100 + 70*np.sin(x*y*50),
+    ), axis=-1)
+    return np.clip(base + rng.normal(0, 20, base.shape), 0, 255).astype(np.uint8)
+
+
+####One benchmark case####
+def _timed(function, *args, **kwargs):
+    start = time.perf_counter()
+    result = function(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def _stage_times(events):
+    #encode/decode metrics events -> {"encode_fft": seconds, ..., "encode_total": seconds}
+    times = {}
+    for event in events:
+        times["%s_%s" % (event["operation"], event["stage"])] = event["seconds"]
+    events.clear()
+    return times
+
+
+def run_case(size, payload_length, repeat, backend, workers):
+    backends.set_backend(backend, workers=workers)
+    events = []
+    metrics.add_sink(events.append)
+    cover = synthetic_cover(size)
+    payload = np.random.default_rng(1).integers(0, 256, payload_length, dtype=np.uint8).tobytes()
+
+    cover_png = io.BytesIO()
+    Image.fromarray(cover).save(cover_png, format="PNG")
+
+    runs = []
+    for _ in range(repeat):
+        stages = {}
+
+        cover_png.seek(0)
+        loaded, stages["load"] = _timed(pngio.read_rgb8, cover_png)
+
+        spectrum, stages["forward_fft"] = _timed(transform.forward, loaded)
+        _, stages["spectrum_quantization"] = _timed(
+            lambda: core._quantize_magnitude(transform.magnitude(spectrum, size), size, size)
+        )
+        del spectrum
+
+        codec = ecc.get_codec()
+        encoded, stages["rs_encode"] = _timed(codec.encode, payload)
+
+        stego = core.encode(loaded, payload)
+        stages.update(_stage_times(events))
+
+        stego_png = io.BytesIO()
+        _, stages["png_write"] = _timed(pngio.write_rgb8, stego_png, stego)
+
+        decoded = core.decode(stego)
+        stages.update(_stage_times(events))
+
+        _, stages["rs_decode"] = _timed(codec.decode, encoded)
+        runs.append((stages, decoded == payload))
+
+    metrics.remove_sink(events.append)
+
+    #Best of the repeats, the least disturbed by anything else on the machine
+    stages = {name: min(run[0][name] for run in runs) for name in runs[0][0]}
+    megapixels = size*size/1e6
+    return {
+        "size": size,
+        "payload_bytes": payload_length,
+        "roundtrip_ok": all(run[1] for run in runs),
+        "stages_s": stages,
+        "throughput": {
+            "encode_payload_MBps": payload_length/1e6/stages["encode_total"],
+            "decode_payload_MBps": payload_length/1e6/stages["decode_total"],
+            "encode_megapixels_per_s": megapixels/stages["encode_total"],
+            "decode_megapixels_per_s": megapixels/stages["decode_total"],
+        },
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss/1024,   #Linux reports KiB
+    }
+
+
+####Driver####
+def _git_commit():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "HEAD"], cwd=os.path.dirname(os.path.abspath(__file__)), stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def payload_sweep(size, steps, max_fill=MAX_FILL):
+    #Empty, then evenly spaced up to max_fill of the capacity
+    capacity = planner.capacity(size, size)*max_fill
+    return sorted(set(int(round(capacity*i/steps)) for i in range(steps+1)))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the fourier_steg encode/decode pipelines")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES), help="Square cover sizes in pixels")
+    parser.add_argument("--payload-steps", type=int, default=4, help="Payload sizes per cover, from empty to --max-fill of the capacity")
+    parser.add_argument("--max-fill", type=float, default=MAX_FILL, help="Largest payload as a share of the capacity (default: %s)" % MAX_FILL)
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per case, the fastest is kept")
+    parser.add_argument("--fft", choices=sorted(backends.BACKENDS), help="FFT backend (default: best installed)")
+    parser.add_argument("--fft-workers", type=int, default=None, help="Threads per FFT")
+    parser.add_argument("--in-process", action="store_true", help="Run every case in this process (peak RSS is then cumulative)")
+    parser.add_argument("--out", help="Write the JSON here instead of stdout")
+    args = parser.parse_args(argv)
+
+    cases = [(size, length) for size in args.sizes for length in payload_sweep(size, args.payload_steps, args.max_fill)]
+    results = []
+    failed = []     #Decode timings of these would be the ECC failure path, keep them out of the results
+    for size, length in cases:
+        case_args = (size, length, args.repeat, args.fft, args.fft_workers)
+        if(args.in_process):
+            result = run_case(*case_args)
+        else:
+            with multiprocessing.Pool(1) as pool:
+                result = pool.apply(run_case, case_args)
+        print("%5d^2 %9d bytes  encode %.3fs  decode %.3fs  peak %.0f MB%s" % (
+            size, length, result["stages_s"]["encode_total"], result["stages_s"]["decode_total"],
+            result["peak_rss_mb"], "" if result["roundtrip_ok"] else "  ROUNDTRIP FAILED, left out of the results"
+        ), file=sys.stderr)
+        if(result["roundtrip_ok"]):
+            results.append(result)
+        else:
+            failed.append({"size": size, "payload_bytes": length})
+
+    report = {
+        "meta": {
+            "commit": _git_commit(),
+            "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "fft_backend": backends.set_backend(args.fft, workers=args.fft_workers).name,
+            "ecc_codec": ecc.get_codec().codec.name,
+            "repeat": args.repeat,
+            "max_fill": args.max_fill,
+        },
+        "results": results,
+        "failed": failed,
+    }
+
+    if(args.out):
+        with open(args.out, "w") as fout:
+            json.dump(report, fout, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,6 @@
+#Headless Fourier steganography, usable without the Tk UI
+from .core import encode, decode, encode_many, decode_many, Cancelled
+from .backends import get_backend, set_backend
+from .planner import capacity, plan
+
+__all__ = ["encode", "decode", "encode_many", "decode_many", "Cancelled", "get_backend", "set_backend", "capacity", "plan"]
@@ -0,0 +1,6 @@
+#Allows running the batch tool as python -m fourier_steg
+import sys
+
+from .cli import main
+
+sys.exit(main())
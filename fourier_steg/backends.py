@@ -0,0 +1,181 @@
+import numpy as np
+import os
+import pickle
+import threading
+
+##################Basic breakdown##################
+'''
+Every forward and inverse transform goes through the backend chosen here so
+the FFT library can be swapped without touching the encode/decode code.
+
+    numpy   Always available, single threaded
+    scipy   scipy.fft, spreads each transform over `workers` threads
+    fftw    pyFFTW, keeps one plan per array size and thread and stores FFTW
+            wisdom on disk so plans measured by one process are reused by
+            the next
+
+With no explicit choice the first available of scipy, fftw and numpy is used.
+Every backend keeps float32/complex64 input in single precision, anything
+else is transformed in double precision.
+'''
+
+#Where pyFFTW wisdom is kept between runs, override with FOURIER_STEG_FFTW_WISDOM
+DEFAULT_WISDOM_PATH = os.path.join(os.path.expanduser("~"), ".cache", "fourier_steg", "fftw_wisdom.pickle")
+
+
+def _real(a):
+    #Single precision input stays single precision, anything else is worked in double
+    a = np.asarray(a)
+    return a if a.dtype == np.float32 else a.astype(np.float64, copy=False)
+
+
+def _complex(a):
+    a = np.asarray(a)
+    return a if a.dtype == np.complex64 else a.astype(np.complex128, copy=False)
+
+
+####Backends####
+class NumpyBackend:
+    name = "numpy"
+
+    def __init__(self, workers=None):
+        self.workers = 1
+
+    def fft(self, a, axis=-1):
+        return np.fft.fft(a, axis=axis)
+
+    def rfft2(self, a, axes=(-2, -1)):
+        return np.fft.rfft2(a, axes=axes)
+
+    def irfft2(self, a, s, axes=(-2, -1)):
+        return np.fft.irfft2(a, s=s, axes=axes)
+
+    def fft2(self, a, axes=(-2, -1)):
+        return np.fft.fft2(a, axes=axes)
+
+    def ifft2(self, a, axes=(-2, -1)):
+        return np.fft.ifft2(a, axes=axes)
+
+
+class ScipyBackend:
+    name = "scipy"
+
+    def __init__(self, workers=None):
+        import scipy.fft
+        self._fft = scipy.fft
+        self.workers = workers if workers is not None else (os.cpu_count() or 1)
+
+    def fft(self, a, axis=-1):
+        return self._fft.fft(a, axis=axis, workers=self.workers)
+
+    def rfft2(self, a, axes=(-2, -1)):
+        return self._fft.rfft2(a, axes=axes, workers=self.workers)
+
+    def irfft2(self, a, s, axes=(-2, -1)):
+        return self._fft.irfft2(a, s=s, axes=axes, workers=self.workers)
+
+    def fft2(self, a, axes=(-2, -1)):
+        return self._fft.fft2(a, axes=axes, workers=self.workers)
+
+    def ifft2(self, a, axes=(-2, -1)):
+        return self._fft.ifft2(a, axes=axes, workers=self.workers)
+
+
+class FFTWBackend:
+    name = "fftw"
+
+    def __init__(self, workers=None, wisdom_path=None, planner_effort="FFTW_MEASURE"):
+        import pyfftw
+        import pyfftw.builders
+        self._pyfftw = pyfftw
+        self.workers = workers if workers is not None else (os.cpu_count() or 1)
+        self.wisdom_path = wisdom_path or os.environ.get("FOURIER_STEG_FFTW_WISDOM", DEFAULT_WISDOM_PATH)
+        self.planner_effort = planner_effort
+        self._local = threading.local()    #Each thread's own plans, a plan's buffers can't be shared
+        self._lock = threading.Lock()       #FFTW's planner isn't thread safe
+        self._load_wisdom()
+
+    def _load_wisdom(self):
+        try:
+            with open(self.wisdom_path, "rb") as wisdom_file:
+                self._pyfftw.import_wisdom(pickle.load(wisdom_file))
+        except (OSError, EOFError, pickle.UnpicklingError):
+            pass    #No usable wisdom yet, plans get measured from scratch
+
+    def _save_wisdom(self):
+        try:
+            os.makedirs(os.path.dirname(self.wisdom_path), exist_ok=True)
+            with open(self.wisdom_path, "wb") as wisdom_file:
+                pickle.dump(self._pyfftw.export_wisdom(), wisdom_file)
+        except OSError:
+            pass    #Wisdom is only a speed up, never fail a transform over it
+
+    def _run(self, kind, a, **kwargs):
+        #One plan per thread, transform kind, input size/type and arguments, built the first time it's seen
+        #Only building one is locked, later threads' plans come from the wisdom the first one measured
+        key = (kind, a.shape, a.dtype.str, tuple(sorted(kwargs.items())))
+        plans = getattr(self._local, "plans", None)
+        if(plans is None):
+            plans = self._local.plans = {}
+        plan = plans.get(key)
+        if(plan is None):
+            with self._lock:
+                builder = getattr(self._pyfftw.builders, kind)
+                plan = builder(
+                    self._pyfftw.empty_aligned(a.shape, dtype=a.dtype),
+                    threads=self.workers, planner_effort=self.planner_effort, **kwargs
+                )
+                self._save_wisdom()
+            plans[key] = plan
+        #The plan owns its output buffer, copy it before the next call reuses it
+        return plan(a).copy()
+
+    def fft(self, a, axis=-1):
+        return self._run("fft", _complex(a), axis=axis)
+
+    def rfft2(self, a, axes=(-2, -1)):
+        return self._run("rfft2", _real(a), axes=tuple(axes))
+
+    def irfft2(self, a, s, axes=(-2, -1)):
+        return self._run("irfft2", _complex(a), s=tuple(s), axes=tuple(axes))
+
+    def fft2(self, a, axes=(-2, -1)):
+        return self._run("fft2", _complex(a), axes=tuple(axes))
+
+    def ifft2(self, a, axes=(-2, -1)):
+        return self._run("ifft2", _complex(a), axes=tuple(axes))
+
+
+BACKENDS = {
+    "numpy": NumpyBackend,
+    "scipy": ScipyBackend,
+    "fftw": FFTWBackend,
+}
+
+
+####Selection####
+_backend = None
+
+
+def set_backend(name=None, **kwargs):
+    #Choose the FFT backend by name, or the best one installed when name is None
+    global _backend
+    if(name is None):
+        for candidate in ("scipy", "fftw"):
+            try:
+                _backend = BACKENDS[candidate](**kwargs)
+                return _backend
+            except ImportError:
+                continue
+        name = "numpy"
+
+    if(name not in BACKENDS):
+        raise ValueError("Unknown FFT backend %r, expected one of %s" % (name, ", ".join(BACKENDS)))
+    _backend = BACKENDS[name](**kwargs)
+    return _backend
+
+
+def get_backend():
+    if(_backend is None):
+        return set_backend(os.environ.get("FOURIER_STEG_FFT") or None)
+    return _backend
@@ -0,0 +1,157 @@
+import numpy as np
+import collections
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+
+##################Basic breakdown##################
+'''
+Optional cache of forward transforms so embedding another payload into a
+cover that has been seen before skips the FFT entirely:
+
+    spectra = SpectrumCache(max_bytes=512*2**20, directory="~/.cache/fourier_steg/spectra")
+    stego_a = encode(cover, payload_a, cache=spectra)
+    stego_b = encode(cover, payload_b, cache=spectra)   #No forward FFT
+
+Entries are keyed by a hash of the cover's pixels, shape and the working
+precision. The in-memory store is least recently used first out once it
+holds more than max_bytes of spectra. With a directory each spectrum is also
+written there as <key>.npz and read back on a memory miss, so the cache
+survives between processes; the oldest files (by last use) are removed once
+the directory holds more than max_disk_bytes.
+
+Cached spectra are read-only, encode() works on a copy.
+'''
+
+log = logging.getLogger("fourier_steg.cache")
+
+
+def cover_key(cover, precision="double"):
+    #Content hash of the pixels plus everything else that changes the spectrum
+    cover = np.ascontiguousarray(cover)
+    digest = hashlib.blake2b(digest_size=20)
+    digest.update(("%s|%s|%s|" % (cover.shape, cover.dtype.str, precision)).encode())
+    digest.update(memoryview(cover).cast("B"))
+    return digest.hexdigest()
+
+
+class SpectrumCache:
+    def __init__(self, max_bytes=256*2**20, directory=None, max_disk_bytes=2*2**30):
+        self.max_bytes = max_bytes
+        self.directory = os.path.expanduser(directory) if directory is not None else None
+        self.max_disk_bytes = max_disk_bytes
+        self._entries = collections.OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        if(self.directory is not None):
+            os.makedirs(self.directory, exist_ok=True)
+
+    def get(self, key):
+        with self._lock:
+            spectrum = self._entries.get(key)
+            if(spectrum is not None):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return spectrum
+
+        spectrum = self._load(key)
+        with self._lock:
+            if(spectrum is None):
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._remember(key, spectrum)
+        return spectrum
+
+    def put(self, key, spectrum):
+        #The cache takes the array over and makes it read-only, pass a copy to keep editing it
+        spectrum = np.asarray(spectrum)
+        spectrum.setflags(write=False)
+        with self._lock:
+            self._remember(key, spectrum)
+        self._store(key, spectrum)
+        return spectrum
+
+    def clear(self):
+        #Forget everything held in memory, files on disk are left alone
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    ####In memory####
+    def _remember(self, key, spectrum):
+        if(spectrum.nbytes > self.max_bytes):
+            return  #Would push everything else out and still not fit
+        if(key in self._entries):
+            self._bytes -= self._entries.pop(key).nbytes
+        self._entries[key] = spectrum
+        self._bytes += spectrum.nbytes
+        while self._bytes > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= evicted.nbytes
+
+    ####On disk####
+    def _path(self, key):
+        return os.path.join(self.directory, key + ".npz")
+
+    def _load(self, key):
+        if(self.directory is None):
+            return None
+        path = self._path(key)
+        try:
+            with np.load(path) as stored:
+                spectrum = stored["spectrum"]
+            os.utime(path)  #Mark as recently used for eviction
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, KeyError):
+            log.warning("Discarding unreadable cached spectrum %s", path)
+            self._remove(path)
+            return None
+        spectrum.setflags(write=False)
+        return spectrum
+
+    def _store(self, key, spectrum):
+        if(self.directory is None):
+            return
+        #Write to a temporary name first so another process never reads half a file
+        temporary = None
+        try:
+            handle, temporary = tempfile.mkstemp(suffix=".tmp", dir=self.directory)
+            with os.fdopen(handle, "wb") as fout:
+                np.savez(fout, spectrum=spectrum)
+            os.replace(temporary, self._path(key))
+        except OSError:
+            log.warning("Could not write cached spectrum to %s", self.directory, exc_info=True)
+            if(temporary is not None):
+                self._remove(temporary)
+            return
+        self._evict_disk()
+
+    def _evict_disk(self):
+        if(self.max_disk_bytes is None):
+            return
+        files = []
+        for entry in os.scandir(self.directory):
+            if(entry.name.endswith(".npz")):
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if(total <= self.max_disk_bytes):
+                break
+            self._remove(path)
+            total -= size
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass    #Already gone, maybe another process evicted it
@@ -0,0 +1,261 @@
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import argparse
+import contextlib
+import glob
+import logging
+import os
+import sys
+
+from . import backends, cache, compression, core, ecc, large, metrics, pngio
+from . import strength as embed_strength
+
+##################Basic breakdown##################
+'''
+Batch front end for encoding/decoding many images at once:
+
+    fourier-steg encode covers/ --payload secret.txt -o out/ -j 8
+    fourier-steg decode "out/*_stego.png" -o extracted/
+
+Inputs can be files, directories or glob patterns. Each image is handled in
+its own worker process and reported on as it finishes. The exit code is
+non-zero if any image failed. --verbose logs each image's stage timings.
+
+Several --payload options pack them all into each cover as a container, with
+each payload's file name as its id. --id pulls single payloads back out by id
+and --all every one of them, written as <image>_payload_<id>.
+'''
+
+IMAGE_EXTENSIONS = (".png", ".bmp", ".tif", ".tiff", ".jpg", ".jpeg", ".webp")
+
+
+####Input handling####
+def expand_inputs(patterns):
+    #Turn files, directories and glob patterns into a list of image paths, keeping the given order
+    paths = []
+    for pattern in patterns:
+        if(os.path.isdir(pattern)):
+            matches = sorted(
+                os.path.join(pattern, name) for name in os.listdir(pattern)
+                if name.lower().endswith(IMAGE_EXTENSIONS)
+            )
+        elif(os.path.isfile(pattern)):
+            matches = [pattern]
+        else:
+            matches = sorted(path for path in glob.glob(pattern, recursive=True) if os.path.isfile(path))
+        paths.extend(matches)
+    return list(dict.fromkeys(paths))   #Drop repeats
+
+
+def find_payload(payload, cover_path):
+    #A payload file is used for every cover, a directory supplies one per cover with the same base name
+    if(not os.path.isdir(payload)):
+        return payload
+    stem = os.path.splitext(os.path.basename(cover_path))[0]
+    matches = sorted(name for name in os.listdir(payload) if os.path.splitext(name)[0] == stem)
+    if(not matches):
+        raise FileNotFoundError("No payload named %s.* in %s" % (stem, payload))
+    return os.path.join(payload, matches[0])
+
+
+def output_path(input_path, output_dir, suffix):
+    stem = os.path.splitext(os.path.basename(input_path))[0]
+    directory = output_dir if output_dir is not None else os.path.dirname(input_path)
+    return os.path.join(directory, stem + suffix)
+
+
+####Work items, run in the worker processes####
+_spectra = None     #Spectrum cache shared by every image a worker encodes
+
+
+def _init_worker(fft, fft_workers, verbose=False, codec=None, cache_dir=None, png_level=None):
+    global _spectra
+    backends.set_backend(fft, workers=fft_workers)
+    ecc.set_codec(codec)
+    if(png_level is not None):
+        pngio.set_level(png_level)
+    if(cache_dir is not None):
+        _spectra = cache.SpectrumCache(directory=cache_dir)
+    if(verbose):
+        logging.basicConfig(level=logging.INFO, format="%(processName)s %(message)s")
+        metrics.add_sink(metrics.logging_sink())
+
+
+def encode_file(cover_path, payload_sources, output, large_mode=False, precision="double", compress=False, strength="heuristic", verify=False):
+    if(len(payload_sources) > 1):
+        return encode_packed(cover_path, payload_sources, output, large_mode, precision, compress, strength, verify)
+    if(large_mode and verify):
+        raise ValueError("--large can't --verify, it never holds the whole stego image")
+    with open(find_payload(payload_sources[0], cover_path), "rb") as payload_file:
+        if(large_mode):
+            return large.encode_file(cover_path, payload_file, output, compress=compress, strength=strength)
+        cover = pngio.read_rgb8(cover_path)
+        stego = core.encode(cover, payload_file, precision=precision, cache=_spectra, compress=compress, strength=strength, verify=verify)    #Streamed through the ECC unless it's compressed
+    pngio.write_rgb8(output, stego)
+    return output
+
+
+def encode_packed(cover_path, payload_sources, output, large_mode=False, precision="double", compress=False, strength="heuristic", verify=False):
+    #Every payload in one container, ids are the payload file names
+    if(large_mode):
+        raise ValueError("--large only takes a single payload")
+    with contextlib.ExitStack() as stack:
+        payloads = []
+        for source in payload_sources:
+            path = find_payload(source, cover_path)
+            payloads.append((os.path.basename(path), stack.enter_context(open(path, "rb"))))
+        cover = pngio.read_rgb8(cover_path)
+        stego = core.encode_many(cover, payloads, precision=precision, cache=_spectra, compress=compress, strength=strength, verify=verify)
+    pngio.write_rgb8(output, stego)
+    return output
+
+
+def decode_file(stego_path, output, partial, large_mode=False, precision="double", ids=None):
+    #ids picks payloads out of a container by id, an empty list takes all of them
+    if(ids is not None):
+        return decode_packed(stego_path, output, partial, large_mode, precision, ids)
+    if(large_mode):
+        payload = large.decode_file(stego_path, strict=True)
+    else:
+        stego = pngio.read_rgb8(stego_path)
+        payload = core.decode(stego, partial=partial, strict=True, precision=precision)
+    with open(output, "wb") as fout:
+        fout.write(payload)
+    return output
+
+
+def decode_packed(stego_path, output, partial, large_mode=False, precision="double", ids=()):
+    #Each payload is written next to output as <output stem>_<id>
+    stego = pngio.read_rgb8(stego_path)
+    payloads = core.decode_many(stego, ids or None, partial=partial or large_mode, strict=True, precision=precision)
+    stem = os.path.splitext(output)[0]
+    outputs = []
+    for item_id, payload in payloads.items():
+        outputs.append("%s_%s" % (stem, os.path.basename(item_id)))  #Ids are names, not paths
+        with open(outputs[-1], "wb") as fout:
+            fout.write(payload)
+    return ", ".join(outputs)
+
+
+####Driver####
+def run_jobs(jobs, workers, fft, fft_workers, verbose=False, codec=None, cache_dir=None, png_level=None):
+    #jobs is a list of (input path, function, args), reports each one as it completes
+    failures = 0
+    if(workers == 1):
+        _init_worker(fft, fft_workers, verbose, codec, cache_dir, png_level)
+        results = ((path, _call(function, args)) for path, function, args in jobs)
+    else:
+        executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(fft, fft_workers, verbose, codec, cache_dir, png_level))
+        futures = {executor.submit(_call, function, args): path for path, function, args in jobs}
+        results = ((futures[future], _result(future)) for future in as_completed(futures))
+
+    try:
+        for path, (output, error) in results:
+            if(error is None):
+                print("OK      %s -> %s" % (path, output))
+            else:
+                failures += 1
+                print("FAILED  %s: %s" % (path, error), file=sys.stderr)
+    finally:
+        if(workers != 1):
+            executor.shutdown(cancel_futures=True)
+
+    print("%d succeeded, %d failed" % (len(jobs)-failures, failures))
+    return failures
+
+
+def _call(function, args):
+    #Catch everything so one bad image is reported instead of stopping the batch
+    try:
+        return function(*args), None
+    except Exception as error:
+        return None, _describe(error)
+
+
+def _result(future):
+    #The worker catches its own errors, this catches the pool's, e.g. BrokenProcessPool when a worker dies
+    try:
+        return future.result()
+    except Exception as error:
+        return None, _describe(error)
+
+
+def _describe(error):
+    return "%s: %s" % (type(error).__name__, error)
+
+
+def _strength(value):
+    #--strength is a name or a fixed additionValue
+    if(value in embed_strength.STRENGTHS):
+        return value
+    try:
+        return embed_strength.check(float(value))
+    except ValueError:
+        raise argparse.ArgumentTypeError("expected one of %s or a positive number, got %r" % (", ".join(embed_strength.STRENGTHS), value))
+
+
+def _png_level(value):
+    #--png-level is a zlib level or "fast", checked here rather than in every worker
+    if(value == "fast"):
+        return value
+    if(value not in [str(level) for level in range(10)]):
+        raise argparse.ArgumentTypeError("expected a zlib level 0-9 or fast, got %r" % value)
+    return int(value)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="fourier-steg", description="Hide payloads in the Fourier magnitude of images, in bulk")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    shared = argparse.ArgumentParser(add_help=False)
+    shared.add_argument("inputs", nargs="+", help="Image files, directories or glob patterns")
+    shared.add_argument("-o", "--output-dir", help="Write results here instead of next to each input")
+    shared.add_argument("-j", "--workers", type=int, default=os.cpu_count() or 1, help="Worker processes (default: all cores)")
+    shared.add_argument("--fft", choices=sorted(backends.BACKENDS), help="FFT backend (default: best installed)")
+    shared.add_argument("--fft-workers", type=int, default=None, help="Threads per FFT (default: 1 with several workers, else all cores)")
+    shared.add_argument("--precision", choices=sorted(core.PRECISIONS), default="double", help="Transform precision, single falls back to double if the calibration margin gets too small")
+    shared.add_argument("--large", action="store_true", help="Memory-mapped single precision mode for very large images (see fourier_steg.large)")
+    shared.add_argument("--ecc", choices=sorted(ecc.CODECS), help="Reed-Solomon codec (default: creedsolo if installed, else numpy)")
+    shared.add_argument("--png-level", type=_png_level, help="zlib level 0-9 for the PNGs written, or fast (default: %d)" % pngio.LEVEL)
+    shared.add_argument("-v", "--verbose", action="store_true", help="Log progress and per-stage timings for every image")
+
+    encode_parser = commands.add_parser("encode", parents=[shared], help="Embed a payload in each cover image")
+    encode_parser.add_argument("--cache-dir", help="Keep cover spectra here so covers encoded again skip the forward FFT")
+    encode_parser.add_argument("--compress", nargs="?", const="auto", choices=["auto"] + sorted(compression.CODECS), help="Compress payloads before embedding, with the smallest codec tried (auto) or the one given")
+    encode_parser.add_argument("--strength", type=_strength, default="heuristic", help="Embedding strength: heuristic (the original), adaptive (estimated from the payload band), simulate (estimated then checked by round trips) or a number")
+    encode_parser.add_argument("--verify", action="store_true", help="Read the payload back from each stego image before writing it, raising the strength if it doesn't come back cleanly")
+    encode_parser.add_argument("-p", "--payload", required=True, action="append", help="Payload file for every cover, or a directory with one payload per cover sharing its base name. Give it more than once to pack several payloads into each cover")
+
+    decode_parser = commands.add_parser("decode", parents=[shared], help="Extract the payload from each stego image")
+    decode_parser.add_argument("--partial", action="store_true", help="Only transform the Fourier rows holding the payload")
+    decode_parser.add_argument("--id", dest="ids", action="append", help="Extract the payload with this id from a container, can be given more than once")
+    decode_parser.add_argument("--all", action="store_true", help="Extract every payload from a container")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+
+    paths = expand_inputs(args.inputs)
+    if(not paths):
+        print("No input images found", file=sys.stderr)
+        return 2
+    if(args.output_dir is not None):
+        os.makedirs(args.output_dir, exist_ok=True)
+
+    jobs = []
+    for path in paths:
+        if(args.command == "encode"):
+            compress = True if args.compress == "auto" else (args.compress or False)
+            jobs.append((path, encode_file, (path, args.payload, output_path(path, args.output_dir, "_stego.png"), args.large, args.precision, compress, args.strength, args.verify)))
+        else:
+            ids = args.ids if args.ids else ([] if args.all else None)
+            jobs.append((path, decode_file, (path, output_path(path, args.output_dir, "_payload.bin"), args.partial, args.large, args.precision, ids)))
+
+    workers = max(1, min(args.workers, len(jobs)))
+    fft_workers = args.fft_workers if args.fft_workers is not None else (1 if workers > 1 else None)
+    failures = run_jobs(jobs, workers, args.fft, fft_workers, args.verbose, args.ecc, getattr(args, "cache_dir", None), args.png_level)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,95 @@
+import collections
+import lzma
+import time
+import zlib
+
+try:
+    import zstandard    #Optional, only offered when it's installed
+except ImportError:
+    zstandard = None
+
+##################Basic breakdown##################
+'''
+Optional compression of payloads before the Reed-Solomon coding. Every
+payload bit costs Fourier samples, so a payload that compresses well needs
+fewer blanked rows and edits fewer coefficients:
+
+    stego = encode(cover, payload, compress=True)      #Smallest of the codecs tried
+    stego = encode(cover, payload, compress="lzma")    #Or one in particular
+
+With compress=True the codecs are tried fastest first and whichever gives
+the smallest output wins. A codec is skipped when the time the first one
+took, scaled by how much slower it usually is, would go past TIME_BUDGET.
+If nothing comes out smaller than the payload itself it's stored as is.
+
+Compressed data is stored behind one byte naming the codec and the second
+flag bit of the length header is set, so decode() knows to decompress. In
+a container the flag means every payload carries that byte (0 for stored).
+zlib and lzma ship with Python, zstd needs the zstandard package.
+'''
+
+TIME_BUDGET = 0.5   #Seconds compress=True may spend on one payload
+
+Codec = collections.namedtuple("Codec", ("tag", "compress", "decompress", "cost"))  #cost is time relative to zlib
+
+STORED = 0
+CODECS = {
+    "zlib": Codec(1, lambda data: zlib.compress(data, 9), zlib.decompress, 1),
+    "lzma": Codec(2, lambda data: lzma.compress(data, preset=6), lzma.decompress, 8),
+}
+if(zstandard is not None):
+    CODECS["zstd"] = Codec(3, lambda data: zstandard.ZstdCompressor(level=19).compress(data),
+                           lambda data: zstandard.ZstdDecompressor().decompress(data), 2)
+
+_BY_TAG = {codec.tag: codec for codec in CODECS.values()}
+
+
+def compress(data, method=True, time_budget=None):
+    #(stored bytes, codec name) with the codec byte in front, or (data, None) if nothing made it smaller
+    #method is True to pick the smallest within the time budget or the name of one codec
+    data = bytes(data)
+    if(method is True):
+        names = sorted(CODECS, key=lambda name: CODECS[name].cost)
+    elif(method in CODECS):
+        names = [method]
+    else:
+        raise ValueError("Unknown compression %r, expected True or one of %s" % (method, ", ".join(sorted(CODECS))))
+
+    budget = TIME_BUDGET if time_budget is None else time_budget
+    best, best_name = data, None
+    start = time.perf_counter()
+    first = None    #(seconds, cost) of the first codec tried, to predict the others
+    for name in names:
+        codec = CODECS[name]
+        if(first is not None and time.perf_counter() - start + first[0]*codec.cost/first[1] > budget):
+            continue
+        codec_start = time.perf_counter()
+        packed = codec.compress(data)
+        if(first is None):
+            first = (time.perf_counter() - codec_start, codec.cost)
+        if(len(packed) + 1 < len(best) + (best_name is not None)):  #Sizes as stored, codec byte included
+            best, best_name = packed, name
+
+    if(best_name is None):
+        return data, None
+    return bytes([CODECS[best_name].tag]) + best, best_name
+
+
+def stored(data):
+    #Payload as kept in a compressed container, STORED is the codec byte for uncompressed data
+    return bytes([STORED]) + bytes(data)
+
+
+def decompress(data):
+    #Undo compress()/stored(), raises ValueError if the codec byte or the data are damaged
+    data = bytes(data)
+    if(not data):
+        raise ValueError("Compressed payload is empty")
+    if(data[0] == STORED):
+        return data[1:]
+    if(data[0] not in _BY_TAG):
+        raise ValueError("Unknown compression codec %d, zstd needs the zstandard package" % data[0])
+    try:
+        return _BY_TAG[data[0]].decompress(data[1:])
+    except Exception as error:
+        raise ValueError("Payload doesn't decompress: %s" % error)
@@ -0,0 +1,138 @@
+import collections
+import struct
+import zlib
+
+##################Basic breakdown##################
+'''
+Container format for putting several payloads in one cover with a single
+forward/inverse transform:
+
+    stego = encode_many(cover, {"notes.txt": notes, "key.bin": key_file})
+    key = decode_many(stego, ["key.bin"])["key.bin"]
+
+A container is flagged in the top bit of the usual 32-bit length header, the
+length is then the bit count of everything that follows it:
+
+    32-bit index size       Bytes of Reed-Solomon coded index, not coded itself
+                            just like the length header
+    Index                   Entry count (16-bit) then per entry the id length
+                            (8-bit), the UTF-8 id and the offset, length and
+                            CRC-32 of the payload (32-bit each), RS coded
+    Payloads                Each one RS coded on its own, so every payload
+                            starts on a block boundary at its offset (in coded
+                            bytes from the end of the index)
+
+Because each payload is coded separately one can be pulled out by id by
+reading the index and then just its own blocks, the others are never read
+or error corrected. With partial decoding only the Fourier rows up to the
+end of that payload are worked out.
+
+All numbers are big-endian, the same as the length header.
+'''
+
+INDEX_SIZE_BITS = 32
+MAX_ID_BYTES = 255
+MAX_ENTRIES = 65535
+
+Entry = collections.namedtuple("Entry", ("id", "offset", "length", "checksum"))
+
+_COUNT = struct.Struct(">H")
+_FIELDS = struct.Struct(">III")    #offset, length, checksum
+
+
+####Payload lists####
+def items(payloads):
+    #A dict or (id, payload) pairs -> list of (id, payload), payloads are bytes or open binary files
+    pairs = list(payloads.items()) if hasattr(payloads, "items") else [tuple(pair) for pair in payloads]
+    if(not pairs):
+        raise ValueError("No payloads to pack")
+    if(len(pairs) > MAX_ENTRIES):
+        raise ValueError("At most %d payloads fit one index, got %d" % (MAX_ENTRIES, len(pairs)))
+
+    seen = set()
+    for item_id, _ in pairs:
+        if(not isinstance(item_id, str)):
+            raise TypeError("Payload ids must be strings, got %r" % (item_id,))
+        if(len(item_id.encode("utf-8")) > MAX_ID_BYTES):
+            raise ValueError("Payload id %r is longer than %d bytes" % (item_id, MAX_ID_BYTES))
+        if(item_id in seen):
+            raise ValueError("Duplicate payload id %r" % (item_id,))
+        seen.add(item_id)
+    return pairs
+
+
+def index_length(ids):
+    #Bytes the index for these ids takes before Reed-Solomon coding
+    return _COUNT.size + sum(1 + len(item_id.encode("utf-8")) + _FIELDS.size for item_id in ids)
+
+
+def layout(ids, sizes, codec):
+    #Where everything goes: (coded index bytes, offset of each payload, bits after the length header)
+    index_bytes = codec.encoded_length(index_length(ids))
+    offsets = []
+    offset = 0
+    for size in sizes:
+        offsets.append(offset)
+        offset += codec.encoded_length(size)
+    return index_bytes, offsets, INDEX_SIZE_BITS + 8*(index_bytes + offset)
+
+
+def data_start(index_bytes):
+    #Bit position of the first payload, counted from the end of the length header
+    return INDEX_SIZE_BITS + 8*index_bytes
+
+
+####Index####
+def pack_index(entries):
+    index = bytearray(_COUNT.pack(len(entries)))
+    for entry in entries:
+        item_id = entry.id.encode("utf-8")
+        index += bytes([len(item_id)]) + item_id + _FIELDS.pack(entry.offset, entry.length, entry.checksum)
+    return bytes(index)
+
+
+def unpack_index(index):
+    #Raises ValueError if the index doesn't parse, which is what a badly damaged one looks like
+    try:
+        count, = _COUNT.unpack_from(index, 0)
+        position = _COUNT.size
+        entries = []
+        for _ in range(count):
+            id_length = index[position]
+            item_id = bytes(index[position+1 : position+1+id_length]).decode("utf-8")
+            position += 1 + id_length
+            entries.append(Entry(item_id, *_FIELDS.unpack_from(index, position)))
+            position += _FIELDS.size
+    except (struct.error, IndexError, UnicodeDecodeError) as error:
+        raise ValueError("Payload index is unreadable: %s" % error)
+    return entries
+
+
+####Embedding####
+def pieces(pairs, offsets, index_bytes, codec):
+    #(bit offset, coded bytes) for each payload then the index, the checksums are worked out
+    #while the payloads stream through so each file is only read once
+    start = data_start(index_bytes)
+    entries = []
+    for (item_id, payload), offset in zip(pairs, offsets):
+        checksum = [0]
+        length = [0]
+
+        def chunks(payload=payload, checksum=checksum, length=length):
+            if(hasattr(payload, "read")):
+                source = iter(lambda read=payload.read: read(codec.blocks_per_task*codec.data_size), b"")
+            else:
+                source = [bytes(payload)]
+            for chunk in source:
+                checksum[0] = zlib.crc32(chunk, checksum[0])
+                length[0] += len(chunk)
+                yield chunk
+
+        position = start + 8*offset
+        for PayloadData in codec.encode_stream(chunks()):
+            yield position, PayloadData
+            position += 8*len(PayloadData)
+        entries.append(Entry(item_id, offset, length[0], checksum[0]))
+
+    yield 0, index_bytes.to_bytes(INDEX_SIZE_BITS//8, "big")
+    yield INDEX_SIZE_BITS, codec.encode(pack_index(entries))
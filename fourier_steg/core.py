@@ -0,0 +1,728 @@
+from reedsolo import ReedSolomonError
+import numpy as np
+import logging
+import math
+import os
+import zlib
+
+from . import cache as spectrum_cache
+from . import strength as embed_strength
+from . import compression, container, dumps, ecc, metrics, planner, tone, transform
+
+##################Basic breakdown##################
+'''
+Headless version of the encode/decode flow from CombinedGUI. Everything
+works on in-memory arrays and bytes:
+
+    stego = encode(cover, payload)  #(H, W, 3) uint8 array, bytes -> (H, W, 3) uint8 array
+    payload = decode(stego)         #(H, W, 3) uint8 array -> bytes
+
+The payload can also be an open binary file, which is read and error
+corrected a group of Reed-Solomon blocks at a time (see ecc).
+
+Nothing is read from or written to disk unless a dump directory is passed,
+in which case the intermediate Fourier domain images are written there with
+the same names the GUI uses, in the background once dumps.set_writer() has
+been called. logarithmic log scales the magnitude dumps, it can also name
+another tone curve such as "sqrt" (see tone).
+
+Both take an optional progress callback which is called with the name of each
+stage as it starts ("fft", "embed", "inverse", "verify" for encode and "fft",
+"extract", "ecc" for decode). Raising Cancelled from it stops the job there.
+The same stages are timed and reported to any sinks registered in metrics.
+Messages go to the "fourier_steg" logger instead of stdout.
+
+precision="single" runs the transforms and magnitude/phase maths in
+float32/complex64. The calibration row is then read back to check the gap
+between the weakest 1 and the strongest 0 is still at least
+SINGLE_PRECISION_MARGIN quantized levels, and if it isn't the whole call is
+done again in double precision.
+
+encode() can take a cache.SpectrumCache to reuse the forward transform of
+covers it has already seen.
+
+encode_many()/decode_many() put several payloads, each with an id, in one
+cover in a single pass and read back all of them or just the ones asked for,
+see container for the format.
+
+compress=True (or a codec name) compresses payloads before the ECC when that
+makes them smaller, and decode() decompresses them again, see compression.
+
+strength picks how much each 1 bit adds to its Fourier magnitude: the
+original hand tuned value by default, "adaptive" to estimate it from the
+payload band (verified as below) or "simulate" to also check that estimate
+with uint8 round trips of the band, see strength.
+
+verify=True reads the payload rows back from the uint8 stego image and
+counts the bit errors against what was embedded. If they aren't clean (see
+strength.clean) it searches for the smallest strength that is, from the
+strength's estimate. The bit errors and margin are reported as metrics values.
+'''
+
+log = logging.getLogger("fourier_steg")
+
+PARTIAL_ROWS = 256  #Most Fourier rows partial decode works out in one go
+#Past this many new rows one FFT per channel is quicker than partial decode's direct DFT, the direct DFT's
+#fixed cost is a pass over the image while the FFT's grows with log(pixels), measured at about
+#PARTIAL_ROWS_PER_OCTAVE rows per doubling of the pixel count past 2**PARTIAL_SMALL_OCTAVES pixels
+PARTIAL_DIRECT_ROWS = 16    #Fewest, small covers are quick either way
+PARTIAL_ROWS_PER_OCTAVE = 5.5
+PARTIAL_SMALL_OCTAVES = 14
+
+#Working dtype for each precision, None leaves the transforms in their native double precision
+PRECISIONS = {"double": None, "single": np.float32}
+SINGLE_PRECISION_MARGIN = 1    #Smallest calibration gap, in quantized levels, single precision may leave
+                               #Big covers sit at 1 even in double precision, below that the 1s and 0s overlap
+
+#The top bits of the 32-bit length header are flags, the rest is the number of bits after it
+CONTAINER_FLAG = 1 << (planner.HEADER_BITS-1)
+COMPRESSED_FLAG = 1 << (planner.HEADER_BITS-2)
+LENGTH_MASK = (1 << (planner.HEADER_BITS-planner.FLAG_BITS)) - 1
+
+
+class Cancelled(Exception):
+    #Raised from a progress callback to abandon an encode/decode between stages
+    pass
+
+
+class _LowMargin(Exception):
+    #Single precision squeezed the calibration margin, the caller redoes the work in double
+    def __init__(self, margin):
+        super().__init__(margin)
+        self.margin = margin
+
+
+####Helpers####
+def _check_rgb(image):
+    #Only 8-bit RGB images are supported, same as splitting a PIL image into three bands
+    image = np.asarray(image)
+    if(image.ndim != 3 or image.shape[2] != 3):
+        raise ValueError("Expected an (H, W, 3) RGB array, got shape %s" % (image.shape,))
+    return image
+
+
+def _write_png16(path, image_2d, column_count, row_count):
+    #Write an interleaved RGBRGB... 16-bit sample image to disk, in the background if dumps has a writer
+    dumps.write(path, image_2d.reshape(row_count, column_count*3))
+
+
+def _interleave(planes):
+    #(3, H, W) channel planes -> (H, W*3) image in RGBRGB... order
+    return np.moveaxis(planes, 0, -1).reshape(planes.shape[1], -1)
+
+
+def _deinterleave(image_2d):
+    #(H, W*3) image in RGBRGB... order -> (3, H, W) channel planes
+    return np.moveaxis(image_2d.reshape(image_2d.shape[0], -1, 3), -1, 0)
+
+
+def _quantize_magnitude(mag_planes, row_count, column_count):
+    #For mag scale by N image pixels
+    mag_planes = mag_planes/(column_count*row_count)
+
+    #Convert 0-1 values above to 0-65535 integers, the same values a 16-bit sample PNG would hold
+    return np.uint16(255*mag_planes)
+
+
+def _payload_size(payload):
+    #Bytes left to read in a payload file, or the length of a bytes payload
+    if(hasattr(payload, "read")):
+        position = payload.tell()
+        size = payload.seek(0, os.SEEK_END) - position
+        payload.seek(position)
+        return size
+    return len(payload)
+
+
+def _precision_dtype(precision):
+    if(precision not in PRECISIONS):
+        raise ValueError("Unknown precision %r, expected one of %s" % (precision, ", ".join(PRECISIONS)))
+    return PRECISIONS[precision]
+
+
+def _calibration_margin(stego):
+    #Read the calibration row of a stego image back the way the decoder would and return
+    #the gap between its weakest 1 sample and strongest 0 sample
+    row_count, column_count = stego.shape[:2]
+    mag_planes = _quantize_magnitude(transform.magnitude_rows(stego, [2]), row_count, column_count)
+    calibration = _interleave(mag_planes).reshape(-1)
+    return math.floor(np.min(calibration[0::2])) - int(np.max(calibration[1::2]))
+
+
+def _log_scale(mag_img_array, logarithmic=True):
+    #Any true logarithmic is the original log curve, a curve name/(name, argument) picks another (see tone)
+    return tone.apply(mag_img_array, logarithmic if isinstance(logarithmic, (str, tuple)) else "log")
+
+
+####Embedding, shared with the large image mode####
+def _plan_rows(codec, payload_bit_count, payload_size, row_count, column_count, flags=0):
+    #The ECC'd size is known up front, so the length header (4 bytes long) and the rows needed
+    #are worked out before any of the payload is read
+    total_bits = planner.HEADER_BITS + payload_bit_count
+
+
+    #Calculate how many rows our data needs, 6 more are added as a buffer against any noise/quantization artifacts
+    rows_required = planner.rows_required(total_bits, column_count)
+    limit = planner.fit_limit(total_bits, column_count, row_count)
+    if(limit is not None):
+        raise ValueError("Payload of %d bytes doesn't fit a %dx%d cover (%s), it holds at most %d bytes" % (
+            payload_size, column_count, row_count, limit, planner.capacity(column_count, row_count, codec.nsym)
+        ))
+    length_bits = np.unpackbits(np.array([payload_bit_count | flags], dtype=">u4").view(np.uint8)).astype(bool)
+    return length_bits, total_bits, rows_required
+
+
+def _plan_payload(run, codec, payload, row_count, column_count, packed=False, compress=False):
+    #Header, rows and the (bit offset, coded bytes) pieces to embed for one payload, or for a
+    #container of (id, payload) pairs when packed, nothing is read until the pieces are
+    flags = 0
+    if(compress):
+        payload, flags = _compress_payload(run, payload, packed, compress)
+
+    if(not packed):
+        payload_size = _payload_size(payload)
+        length_bits, total_bits, rows_required = _plan_rows(codec, 8*codec.encoded_length(payload_size), payload_size, row_count, column_count, flags)
+        return length_bits, total_bits, rows_required, payload_size, _sequential(codec.encode_stream(payload))
+
+    sizes = [_payload_size(item) for _, item in payload]
+    index_bytes, offsets, payload_bit_count = container.layout([item_id for item_id, _ in payload], sizes, codec)
+    length_bits, total_bits, rows_required = _plan_rows(codec, payload_bit_count, sum(sizes), row_count, column_count, CONTAINER_FLAG | flags)
+    return length_bits, total_bits, rows_required, sum(sizes), container.pieces(payload, offsets, index_bytes, codec)
+
+
+def _compress_payload(run, payload, packed, method):
+    #Compressed payload(s) and the header flags to go with them, payload files are read in one go for this
+    def read(item):
+        return item.read() if hasattr(item, "read") else bytes(item)
+
+    if(not packed):
+        data = read(payload)
+        stored, name = compression.compress(data, method)
+        run.value(compression=name, compressed_bytes=len(stored), uncompressed_bytes=len(data))
+        return stored, (COMPRESSED_FLAG if name is not None else 0)
+
+    #In a container every payload gets the codec byte, stored ones included
+    items = []
+    names = []
+    for item_id, item in payload:
+        data = read(item)
+        stored, name = compression.compress(data, method)
+        items.append((item_id, stored if name is not None else compression.stored(data)))
+        names.append(name)
+    run.value(compression=names)
+    return items, COMPRESSED_FLAG
+
+
+def _decompress(run, payload, strict, what="payload"):
+    try:
+        return compression.decompress(payload)
+    except ValueError:
+        if(strict):
+            raise
+        log.warning("The %s doesn't decompress, outputting it as stored", what)
+        run.value(decompress_failed=True)
+        return payload
+
+
+def _sequential(chunks):
+    #Place coded chunks one after another from the end of the length header
+    offset = 0
+    for chunk in chunks:
+        yield offset, chunk
+        offset += 8*len(chunk)
+
+
+def _band_rows(rows_required, row_count):
+    #Rows of the shifted layout that get edited, the top rows_required then the bottom rows_required
+    return np.concatenate((np.arange(rows_required), np.arange(row_count-rows_required, row_count)))
+
+
+def _band_bits(row_length, rows_required, length_bits, pieces, total_bits):
+    #Flat masks over the interleaved band of the samples that carry a 1 and of every sample decode()
+    #compares with its threshold, the calibration row then the payload span
+    ones = np.zeros(2*rows_required*row_length, dtype=bool)
+    readable = np.zeros_like(ones)
+    readable[2*row_length : 3*row_length+total_bits] = True
+
+    #The calibration 10101010... pattern
+    ones[2*row_length : 3*row_length : 2] = True
+
+    #Header first then each group of ECC'd blocks as it's encoded
+    payload_span = ones[3*row_length : 3*row_length+total_bits]
+    payload_span[:len(length_bits)] = length_bits
+    for offset, PayloadData in pieces:
+        #Convert our data payload to an array of bits, offsets count from the end of the header
+        payload_bits = np.unpackbits(np.frombuffer(bytes(PayloadData), dtype=np.uint8)).astype(bool)
+        offset += len(length_bits)
+        payload_span[offset:offset+len(payload_bits)] = payload_bits
+    return ones, readable
+
+
+def _blank_band(image_2d, rows_required):
+    ###Set however many rows is necessary to hold our payload to black along the top and bottom (symmetry in space)###
+    row_length = image_2d.shape[1]
+    image_flat = image_2d.reshape(-1)   #View of the same samples in RGBRGB... order
+
+    #Set the top rows_required to 0,0,0 (black/empty)
+    image_2d[:rows_required] = 0
+
+    #Set the bottom rows_required to 0,0,0 (black/empty)
+    #The first sample of this block has always been left untouched, keep it that way so stego output doesn't change
+    image_flat[rows_required*row_length+1:] = 0
+
+
+def _embed_band(image_2d, rows_required, ones, additionValue):
+    #image_2d is the interleaved (2*rows_required, W*3) band magnitude, edited in place
+    log.info("Using encoding value of: %d", additionValue)
+    log.info("Encoding...")
+
+
+    ################ADD PAYLOAD DATA TO THE FOURIER SPACE IMAGE##################
+    _blank_band(image_2d, rows_required)
+
+    #Set the calibration pattern, header and payload in the data of the top black section
+    image_2d.reshape(-1)[ones] += additionValue
+
+
+def _pick_strength(strength, image_2d, band_magnitude, ones, readable, histograms, pixel_count):
+    #additionValue for a strength name or number, before the band is blanked, "simulate" starts from the estimate
+    if(strength == "heuristic"):
+        return embed_strength.heuristic(image_2d)
+    if(strength in embed_strength.STRENGTHS):
+        ones, readable = (_deinterleave(mask.reshape(image_2d.shape)) for mask in (ones, readable))
+        return embed_strength.estimate(histograms, band_magnitude, ones, readable, pixel_count)
+    return strength
+
+
+def _edit_delta(image_2d, band_magnitude, band_spectrum):
+    #The edited magnitudes keep the original phase, so each edit is the change in magnitude along that phase
+    band_phase = np.exp(1j*np.angle(band_spectrum))
+    return (_deinterleave(image_2d) - band_magnitude)*band_phase
+
+
+def _round_trip(spectrum, band_rows, blanked_2d, band_magnitude, band_spectrum, ones, readable):
+    #Stego image for any strength, from the blanked band and the unedited spectrum
+    blank_delta = _edit_delta(blanked_2d, band_magnitude, band_spectrum)
+    ones_delta = _edit_delta(ones.reshape(blanked_2d.shape), 0, band_spectrum)
+    return embed_strength.RoundTrip(spectrum, band_rows, blank_delta, ones_delta, ones, readable)
+
+
+####Define Fourier functions####
+def encode(cover, payload, dump_dir=None, logarithmic=False, progress=None, precision="double", cache=None, compress=False, strength="heuristic", verify=False):
+    return _encode_run(cover, payload, False, dump_dir, logarithmic, progress, precision, cache, compress, strength, verify)
+
+
+def encode_many(cover, payloads, dump_dir=None, logarithmic=False, progress=None, precision="double", cache=None, compress=False, strength="heuristic", verify=False):
+    #payloads is a dict or (id, payload) pairs, ids are strings and each payload bytes or an open binary file
+    return _encode_run(cover, container.items(payloads), True, dump_dir, logarithmic, progress, precision, cache, compress, strength, verify)
+
+
+def decode(stego, dump_dir=None, logarithmic=False, partial=False, strict=False, progress=None, precision="double"):
+    return _decode_run(stego, None, dump_dir, logarithmic, partial, strict, progress, precision)
+
+
+def decode_many(stego, ids=None, dump_dir=None, logarithmic=False, partial=False, strict=False, progress=None, precision="double"):
+    #{id: payload} for the given ids, or every payload in the container when ids is None
+    #Raises KeyError for an id the image doesn't hold, with strict a failed checksum raises ValueError
+    return _decode_run(stego, [] if ids is None else list(ids), dump_dir, logarithmic, partial, strict, progress, precision)
+
+
+def _encode_run(cover, payload, packed, dump_dir, logarithmic, progress, precision, cache, compress, strength, verify):
+    dtype = _precision_dtype(precision)
+    strength = embed_strength.check(strength)
+    with metrics.Run("encode", progress) as run:
+        files = [item for _, item in payload] if packed else [payload]
+        positions = [(item, item.tell()) for item in files if hasattr(item, "read")]
+        try:
+            return _encode(run, cover, payload, packed, dump_dir, logarithmic, dtype, cache, compress, strength, verify)
+        except _LowMargin as error:
+            log.warning("Single precision left a calibration margin of %d, encoding again in double precision", error.margin)
+            run.value(precision_fallback=True)
+            for item, position in positions:
+                item.seek(position)  #Stream the payload again from the start
+            return _encode(run, cover, payload, packed, dump_dir, logarithmic, None, cache, compress, strength, verify)
+
+
+def _decode_run(stego, ids, dump_dir, logarithmic, partial, strict, progress, precision, fft_dtype=None):
+    #fft_dtype is the precision partial decode's per-channel FFTs run in, the decode's own when None
+    dtype = _precision_dtype(precision)
+    with metrics.Run("decode", progress) as run:
+        try:
+            return _decode(run, stego, dump_dir, logarithmic, partial, strict, dtype, ids, fft_dtype)
+        except _LowMargin as error:
+            log.warning("Single precision left a calibration margin of %d, decoding again in double precision", error.margin)
+            run.value(precision_fallback=True)
+            return _decode(run, stego, dump_dir, logarithmic, partial, strict, None, ids, fft_dtype)
+
+
+def _forward_cached(run, cover, dtype, cache):
+    #Forward transform of the cover, from the cache when it's been seen before
+    #Returns the spectrum and whether it may be edited in place (cached ones are shared)
+    if(cache is None):
+        return transform.forward(cover, dtype), True
+
+    key = spectrum_cache.cover_key(cover, "double" if dtype is None else np.dtype(dtype).name)
+    spectrum = cache.get(key)
+    run.value(cache_hit=spectrum is not None)
+    if(spectrum is None):
+        spectrum = cache.put(key, transform.forward(cover, dtype))
+    return spectrum, False
+
+
+def _encode(run, cover, payload, packed, dump_dir, logarithmic, dtype, cache, compress=False, strength="heuristic", verify=False):
+    cover = _check_rgb(cover)
+    output_intermediate_steps = dump_dir is not None #Should we show the intermediate steps? (Fourier domain images)
+
+    ################CONVERT TO FOURIER SPACE##################
+    row_count, column_count = cover.shape[:2]
+
+
+    ####Perform Fourier transform on all channels at once####
+    run.stage("fft", shape=cover.shape, bytes=cover.nbytes)
+    spectrum, writable = _forward_cached(run, cover, dtype, cache)
+
+
+    #If we want to output the pre-edit Fourier space image do it here
+    if(output_intermediate_steps):
+        mag_planes, phase_planes = transform.magnitude_phase(spectrum, column_count)
+
+        #Combine the seperate R,G,B channels to form final images
+        phase_img_array = _interleave(phase_planes)
+        mag_img_array = _interleave(mag_planes)
+
+        ###Scale each mag/phase array to the 48 bit image range###
+        #For phase, shift from -pi, +pi to 0, +2pi instead of abs to preserve negatives
+        #Divide by 2pi as that's the maximum value it could have
+        phase_img_array_output = (phase_img_array+1*np.pi)/(2*np.pi)
+
+        #For magnitude scale by N image pixels
+        mag_img_array_output =  mag_img_array /(column_count*row_count)
+
+        #Convert 0-1 values above to 0-65535 integers for 16-bit sample PNG
+        phase_img_array_output = np.uint16(np.round( 65535*(phase_img_array_output) ))    #Casting doesn't round, do it ourselves to be more accurate
+        mag_img_array_output = np.uint16(255*mag_img_array_output)
+
+        #Should we log scale the output image?
+        if(logarithmic):
+            mag_img_array_output = _log_scale(mag_img_array_output, logarithmic)
+
+        _write_png16(os.path.join(dump_dir, "Magnitude_pre_edit.png"), mag_img_array_output, column_count, row_count)
+        _write_png16(os.path.join(dump_dir, "phase.png"), phase_img_array_output, column_count, row_count)
+
+
+    run.stage("embed")
+    codec = ecc.get_codec()
+    length_bits, total_bits, rows_required, payload_size, pieces = _plan_payload(run, codec, payload, row_count, column_count, packed, compress)
+    run.value(payload_bytes=payload_size)
+
+
+    ###Only the top and bottom rows_required rows of the Fourier space image are edited, pull out just those###
+    band_rows = _band_rows(rows_required, row_count)
+    band_spectrum = transform.spectrum_rows(spectrum, band_rows, column_count)
+    band_magnitude = np.abs(band_spectrum)
+    image_2d = _interleave(band_magnitude)  #Top rows_required rows then bottom rows_required rows
+    run.value(rows_required=rows_required, payload_bits=total_bits, band_bytes=band_spectrum.nbytes)
+
+    ones, readable = _band_bits(column_count*3, rows_required, length_bits, pieces, total_bits)
+    histograms = embed_strength.histograms(cover) if strength in ("adaptive", "simulate") else None
+    additionValue = _pick_strength(strength, image_2d, band_magnitude, ones, readable, histograms, row_count*column_count)
+    #The estimate can fall short on perfectly flat covers, so an adaptive strength is always checked with one read back
+    verify = verify or strength == "adaptive"
+
+    #Simulating works out the stego image for any strength up front, the inverse stage then only picks one
+    round_trip = None
+    if(strength == "simulate"):
+        _blank_band(image_2d, rows_required)
+        round_trip = _round_trip(spectrum, band_rows, image_2d, band_magnitude, band_spectrum, ones, readable)
+        run.value(estimated_additionValue=additionValue)
+        additionValue, (errors, margin, _) = embed_strength.search(round_trip.read, additionValue)
+        run.value(simulated_bit_errors=errors, simulated_margin=margin)
+
+    _embed_band(image_2d, rows_required, ones, additionValue)
+    run.value(additionValue=additionValue)
+
+
+    ################DO THE INVERSE FOURIER TO GET THE FINAL IMAGE WITH PAYLOAD INSIDE##################
+    run.stage("inverse", shape=spectrum.shape, bytes=spectrum.nbytes)
+
+    if(round_trip is not None):
+        img_rgb = round_trip.image(additionValue)
+    else:
+        delta = _edit_delta(image_2d, band_magnitude, band_spectrum)
+
+        #Perform inverse FFT to get image data back, reusing the original spectrum everywhere outside the band
+        #Verifying keeps the spectrum as it was in case the strength has to be raised
+        img_planes = transform.inverse_edited(spectrum, band_rows, delta, overwrite=writable and not verify)
+
+        #Round and write each channel straight into the final RGB image
+        img_rgb = transform.to_image(img_planes)
+
+
+    ################READ THE PAYLOAD BACK FROM THE FINAL IMAGE##################
+    if(verify):
+        run.stage("verify")
+        reading = embed_strength.read_back(img_rgb, ones, readable)
+        errors, margin = reading[:2]
+        log.info("Verifying with encoding value %d: %d bit errors, margin %d", additionValue, errors, margin)
+        #A simulated strength has already been through the same search
+        if(not embed_strength.clean(reading) and strength != "simulate"):
+            #The stego image is linear in the strength until it's rounded, so each try is just rounding and reading back
+            blanked_2d = image_2d.copy()
+            blanked_2d.reshape(-1)[ones] -= additionValue
+            round_trip = _round_trip(spectrum, band_rows, blanked_2d, band_magnitude, band_spectrum, ones, readable)
+
+            #Search from the estimate, the strength that failed counts towards the best one found
+            if(histograms is None):
+                histograms = embed_strength.histograms(cover)
+            estimate = _pick_strength("adaptive", image_2d, band_magnitude, ones, readable, histograms, row_count*column_count)
+            first_additionValue = additionValue
+            additionValue, reading = embed_strength.search(round_trip.read, estimate, {additionValue: reading})
+            if(additionValue != first_additionValue):
+                img_rgb = round_trip.image(additionValue)
+                image_2d.reshape(-1)[ones] += additionValue - first_additionValue
+            errors, margin = reading[:2]
+            run.value(verify_retried=True, additionValue=additionValue)
+        run.value(bit_errors=errors, verify_margin=margin)
+
+
+    #If we want to output the post-edit Fourier space image do it here, once verifying has settled the strength
+    if(output_intermediate_steps):
+        mag_img_array[:rows_required] = image_2d[:rows_required]
+        mag_img_array[row_count-rows_required:] = image_2d[rows_required:]
+
+        ###Scale each mag/phase array to the 48 bit image range###
+        #For magnitude scale by N image pixels
+        image_2d_output = mag_img_array/(column_count*row_count)
+        image_2d_output = np.uint16(255*image_2d_output)
+
+        #Should we log scale the output image?
+        if(logarithmic):
+            image_2d_output = _log_scale(image_2d_output, logarithmic)
+
+        _write_png16(os.path.join(dump_dir, "Magnitude_post_edit.png"), image_2d_output, column_count, row_count)
+
+    if(dtype is not None):
+        margin = _calibration_margin(img_rgb)
+        run.value(calibration_margin=margin)
+        if(margin < SINGLE_PRECISION_MARGIN):
+            raise _LowMargin(margin)
+
+    log.info("Finished...")
+    return img_rgb
+
+
+
+def _direct_rows(row_count, column_count):
+    #Most new rows partial decode works out with the direct DFT before an FFT per channel is quicker
+    octaves = math.log2(row_count*column_count) - PARTIAL_SMALL_OCTAVES
+    return max(PARTIAL_DIRECT_ROWS, round(PARTIAL_ROWS_PER_OCTAVE*octaves))
+
+
+def _decode(run, stego, dump_dir, logarithmic, partial, strict, dtype, ids=None, fft_dtype=None):
+    #ids None reads a single payload, a list (empty for all) reads those from a container
+    stego = _check_rgb(stego)
+    output_intermediate_steps = dump_dir is not None #Should we show the intermediate steps? (Fourier domain images)
+
+    ################CONVERT TO FOURIER SPACE##################
+    row_count, column_count = stego.shape[:2]
+    row_length = column_count*3
+
+    #Partial mode only works out the rows the payload band needs, dumps need the whole spectrum
+    partial = partial and not output_intermediate_steps
+    run.stage("fft", shape=stego.shape, bytes=stego.nbytes, partial=partial)
+    if(partial):
+        #Rows are filled in as the band grows, the rest are never transformed or read
+        image_2d = np.zeros((row_count, row_length), dtype=np.uint16)
+        rows_done = 2   #Nothing above the calibration row is read
+        direct_rows = _direct_rows(row_count, column_count)
+    else:
+        ####Perform fourier transform on all channels at once####
+        spectrum = transform.forward(stego, dtype)
+
+        ###Scale the magnitude array to the 48 bit image range###
+        mag_planes = _quantize_magnitude(transform.magnitude(spectrum, column_count), row_count, column_count)
+
+        #Combine the seperate R,G,B channels to form the final image
+        image_2d = _interleave(mag_planes)
+
+    def ensure_band(stop):
+        #Make sure every row holding a sample before flat index stop has been worked out
+        nonlocal rows_done
+        if(not partial):
+            return
+        stop_row = min(math.ceil(stop/row_length), row_count)
+
+        #The direct DFT costs a pass over the image per row, a wide band is cheaper from an FFT of each channel
+        #Only one channel's half spectrum is held at a time, never the whole image's
+        if(stop_row-rows_done > direct_rows):
+            run.value(partial_fft=True)
+            for channel in range(3):
+                half = transform.channel_spectrum(stego, channel, fft_dtype or dtype or np.float64)
+                for start in range(rows_done, stop_row, PARTIAL_ROWS):
+                    end = min(start+PARTIAL_ROWS, stop_row)
+                    mag_plane = np.abs(transform.spectrum_rows(half, np.arange(start, end), column_count))[0]
+                    image_2d[start:end, channel::3] = _quantize_magnitude(mag_plane, row_count, column_count)
+                del half
+            rows_done = stop_row
+            return
+
+        for start in range(rows_done, stop_row, PARTIAL_ROWS):  #A bounded number of rows at a time keeps memory flat
+            end = min(start+PARTIAL_ROWS, stop_row)
+            mag_planes = transform.magnitude_rows(stego, np.arange(start, end), dtype=dtype or np.float64)
+            image_2d[start:end] = _interleave(_quantize_magnitude(mag_planes, row_count, column_count))
+        rows_done = max(rows_done, stop_row)
+
+
+    #Dump Fourier space images if selected, the phase is only needed for this
+    if(output_intermediate_steps):
+        #For phase shift from -pi, +pi to 0, +2pi instead of abs to preserve
+        phase_planes = (transform.phase(spectrum, column_count)+1*np.pi)/(2*np.pi)
+        phase_planes = np.uint16(np.round( 65535*(phase_planes) ))    #Casting doesn't round, do it ourselves to be more accurate
+        _write_png16(os.path.join(dump_dir, "Phase_Decoded.png"), _interleave(phase_planes), column_count, row_count)
+
+        #Should we log scale the output image?
+        mag_img_array_output = image_2d
+        if(logarithmic):
+            mag_img_array_output = _log_scale(image_2d, logarithmic)
+
+        _write_png16(os.path.join(dump_dir, "Magnitude_Decoded.png"), mag_img_array_output, column_count, row_count)
+
+
+
+    ################READ DATA FROM FOURIER SPACE IMAGE##################
+    run.stage("extract")
+
+    #Read the actual data
+    log.info("Extracting payload...")
+    image_flat = image_2d.reshape(-1)
+
+    #Crop the start and end of payload
+    #The payload will only start after 2 rows and never be more than half of the height so crop it to those
+    payload_start = 3*row_length
+    payload_stop = int((row_count/2)*row_length)
+
+    #Figure our the boundary values using the calibration header
+    ensure_band(payload_start+32)
+    calibration = image_flat[2*row_length : 3*row_length]
+    LowArray = calibration[0::2]    #Bit is 1
+
+    #We assume that a 1 bit will always have a value at least of HighBitBounday
+    HighBitBounday = math.floor(np.min(LowArray))
+
+
+    log.info("Decoding high bit boundary value: %d", HighBitBounday)
+    run.value(HighBitBounday=HighBitBounday)
+
+    if(dtype is not None):
+        margin = HighBitBounday - int(np.max(calibration[1::2]))
+        run.value(calibration_margin=margin)
+        if(margin < SINGLE_PRECISION_MARGIN):
+            raise _LowMargin(margin)
+
+
+    #Read length header, the top bits are flags
+    length_bits = image_flat[payload_start : payload_start+32]>=HighBitBounday
+    header = int(np.packbits(length_bits).view(">u4")[0])
+    payload_length = header & LENGTH_MASK
+
+    if(header & CONTAINER_FLAG or ids is not None):
+        data_stop = min(payload_start+32+payload_length, payload_stop)
+        payloads = _read_container(run, image_flat, ensure_band, payload_start+32, data_stop, HighBitBounday, header, ids, strict)
+        if(payloads is not None):
+            if(partial):
+                run.value(rows_transformed=rows_done-2)
+            return payloads
+
+        #A damaged length header can look like a container, read it the old way and let the ECC sort it out
+        log.warning("Length header is flagged as a container but has no readable index, reading a single payload")
+        header = payload_length
+
+    #Actually crop off end section now and convert to bytearray for final file
+    payload_end = min(payload_start+32+payload_length, payload_stop)
+    ensure_band(payload_end)
+    payload_array = image_flat[payload_start+32 : payload_end]
+    Decoded_Payload_Binary = payload_array>=HighBitBounday
+    payload_bytearray = bytearray(np.packbits(Decoded_Payload_Binary))
+    run.value(payload_bits=len(Decoded_Payload_Binary))
+    if(partial):
+        run.value(rows_transformed=rows_done-2)
+
+    #Decode the ECC
+    run.stage("ecc", payload_bytes=len(payload_bytearray))
+    try:
+        payload_bytearray = ecc.get_codec().decode(payload_bytearray)
+    except ReedSolomonError:
+        if(strict):
+            raise
+        log.warning("Too many errors to fully correct, outputting raw data")    #Too many errors, just output the raw data
+        run.value(ecc_failed=True)
+
+    if(header & COMPRESSED_FLAG):
+        payload_bytearray = _decompress(run, payload_bytearray, strict)
+
+    log.info("Finished decoding")
+    return bytes(payload_bytearray)
+
+
+def _read_container(run, image_flat, ensure_band, data_start, data_stop, HighBitBounday, header, ids, strict):
+    #Read the index then only the payloads asked for, positions are counted from data_start
+    if(not header & CONTAINER_FLAG):
+        raise ValueError("Image holds a single payload rather than a container, use decode()")
+    codec = ecc.get_codec()
+
+    def read_coded(start, byte_count, what):
+        #Error correct byte_count coded bytes from bit start, the raw bytes if there are too many errors
+        start = min(data_start+start, data_stop)
+        stop = min(start+8*byte_count, data_stop)
+        ensure_band(stop)
+        coded = bytearray(np.packbits(image_flat[start:stop]>=HighBitBounday))
+        try:
+            return codec.decode(coded)
+        except ReedSolomonError:
+            if(strict):
+                raise
+            log.warning("Too many errors to fully correct %s, outputting raw data", what)
+            run.value(ecc_failed=True)
+            return coded
+
+    ensure_band(data_start+container.INDEX_SIZE_BITS)
+    index_size = image_flat[data_start : data_start+container.INDEX_SIZE_BITS]>=HighBitBounday
+    index_bytes = int(np.packbits(index_size).view(">u4")[0])
+    try:
+        entries = container.unpack_index(read_coded(container.INDEX_SIZE_BITS, index_bytes, "the payload index"))
+    except ValueError:
+        if(ids is not None or strict):
+            raise
+        return None
+    run.value(payload_count=len(entries))
+    if(ids is None):
+        raise ValueError("Image holds a container of %d payloads (%s), use decode_many()" % (
+            len(entries), ", ".join(repr(entry.id) for entry in entries)
+        ))
+
+    by_id = {entry.id: entry for entry in entries}
+    missing = [item_id for item_id in ids if item_id not in by_id]
+    if(missing):
+        raise KeyError("No payload %s in this image, it holds %s" % (
+            ", ".join(map(repr, missing)), ", ".join(repr(entry.id) for entry in entries)
+        ))
+    wanted = [by_id[item_id] for item_id in ids] if ids else entries
+
+
+    #Only the blocks of the payloads asked for are read and corrected
+    run.stage("ecc", payloads=len(wanted))
+    start = container.data_start(index_bytes)
+    payloads = {}
+    for entry in sorted(wanted, key=lambda entry: entry.offset):
+        payload = bytes(read_coded(start + 8*entry.offset, codec.encoded_length(entry.length), "payload %r" % entry.id))[:entry.length]
+        if(zlib.crc32(payload) != entry.checksum):
+            if(strict):
+                raise ValueError("Payload %r failed its checksum" % entry.id)
+            log.warning("Payload %r failed its checksum, outputting it anyway", entry.id)
+            run.value(checksum_failed=True)
+        if(header & COMPRESSED_FLAG):
+            payload = _decompress(run, payload, strict, "payload %r" % entry.id)
+        payloads[entry.id] = payload
+
+    log.info("Finished decoding")
+    return {entry.id: payloads[entry.id] for entry in wanted}
@@ -0,0 +1,97 @@
+from concurrent.futures import ThreadPoolExecutor
+import atexit
+import logging
+import threading
+
+from . import pngio
+
+##################Basic breakdown##################
+'''
+Writer for the intermediate Fourier domain images encode()/decode() dump.
+By default each one is written before the call carries on, as it always
+was. With a background writer they're handed to a thread pool instead and
+encode()/decode() return as soon as the stego image or payload is ready:
+
+    dumps.set_writer(workers=2, max_pending=4)
+    stego = encode(cover, payload, dump_dir="dumps")   #Dumps still being written
+    dumps.flush()                                      #Wait for them if you need them now
+
+At most max_pending dumps are queued or being written, a call that would
+go past that waits for a slot, which caps the memory held by arrays waiting
+to be written. Arrays must not be changed after they're handed over. A dump
+that fails to write is logged rather than failing the call it came from.
+Anything still pending is flushed when the interpreter exits.
+'''
+
+log = logging.getLogger("fourier_steg.dumps")
+
+
+class DumpWriter:
+    def __init__(self, workers=2, max_pending=4, level=None):
+        self.level = level  #zlib level, None for pngio's default
+        self.errors = []
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="fourier_steg_dump")
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._pending = 0
+        self._idle = threading.Condition()
+
+    def submit(self, path, image_2d):
+        self._slots.acquire()   #Blocks while max_pending dumps are in flight
+        try:
+            future = self._executor.submit(pngio.write_rgb16, path, image_2d, self.level)
+        except BaseException:
+            self._slots.release()
+            raise
+        with self._idle:
+            self._pending += 1
+        future.add_done_callback(self._done)
+        return future
+
+    def flush(self, timeout=None):
+        #Wait until every dump handed over so far has been written, False if timeout ran out first
+        with self._idle:
+            return self._idle.wait_for(lambda: self._pending == 0, timeout)
+
+    def close(self):
+        self.flush()
+        self._executor.shutdown()
+
+    def _done(self, future):
+        error = future.exception()
+        if(error is not None):
+            log.error("Writing a Fourier domain dump failed: %s", error)
+            self.errors.append(error)
+        self._slots.release()
+        with self._idle:
+            self._pending -= 1
+            self._idle.notify_all()
+
+
+####Selection####
+_writer = None
+
+
+def set_writer(workers=2, max_pending=4, level=None):
+    #Write dumps in the background, workers=0 goes back to writing them in place
+    global _writer
+    if(_writer is not None):
+        _writer.close()
+    _writer = DumpWriter(workers, max_pending, level) if workers else None
+    return _writer
+
+
+def write(path, image_2d):
+    #(H, W*3) 16-bit samples to a 48-bit PNG, in the background if a writer is set
+    if(_writer is None):
+        pngio.write_rgb16(path, image_2d)
+        return None
+    return _writer.submit(path, image_2d)
+
+
+def flush(timeout=None):
+    if(_writer is not None):
+        return _writer.flush(timeout)
+    return True
+
+
+atexit.register(flush)
@@ -0,0 +1,268 @@
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from reedsolo import RSCodec
+import numpy as np
+import collections
+import os
+
+##################Basic breakdown##################
+'''
+Reed-Solomon layer for the payload. The wire format is exactly what
+RSCodec(13) has always produced: the payload is cut into 242 byte blocks and
+each one gets 13 parity bytes, so a 255 byte block per 242 payload bytes with
+a shorter one at the end. Because every block stands on its own the payload
+can be encoded/decoded a group of blocks at a time, streamed from a file and
+spread across a thread or process pool.
+
+    numpy      All blocks of a group at once with GF(256) lookup tables. On
+               decode the syndromes are checked for every block together and
+               only blocks that actually hold errors go through reedsolo
+    creedsolo  reedsolo's compiled extension, if it's installed
+    reedsolo   Pure Python, one block at a time
+
+With no explicit choice creedsolo is used when installed, else numpy.
+'''
+
+BLOCK_SIZE = 255    #Bytes per encoded block, data plus parity
+
+#GF(256) with the same primitive polynomial reedsolo uses by default, powers of 2 as the roots
+PRIMITIVE = 0x11d
+
+
+####GF(256) tables####
+def _gf_tables():
+    gf_exp = np.zeros(512, dtype=np.int32)
+    gf_log = np.zeros(256, dtype=np.int32)
+    x = 1
+    for i in range(255):
+        gf_exp[i] = x
+        gf_log[x] = i
+        x <<= 1
+        if(x & 0x100):
+            x ^= PRIMITIVE
+    gf_exp[255:510] = gf_exp[:255]
+
+    #Full multiplication table, a 0 on either side gives 0
+    gf_mul = gf_exp[gf_log[:, None] + gf_log[None, :]].astype(np.uint8)
+    gf_mul[0, :] = 0
+    gf_mul[:, 0] = 0
+    return gf_exp, gf_mul
+
+
+_GF_EXP, _GF_MUL = _gf_tables()
+
+
+def _generator_poly(nsym):
+    #prod(x - a^i) for i in 0..nsym-1, highest power first, same as reedsolo's rs_generator_poly
+    poly = np.array([1], dtype=np.uint8)
+    for i in range(nsym):
+        root = _GF_EXP[i]
+        shifted = np.append(poly, 0)
+        scaled = np.insert(_GF_MUL[poly, root], 0, 0)
+        poly = shifted ^ scaled
+    return poly
+
+
+####Codecs####
+class NumpyCodec:
+    name = "numpy"
+
+    def __init__(self, nsym):
+        self.nsym = nsym
+        generator = _generator_poly(nsym)
+        #Row c is every generator coefficient (after the leading 1) times c
+        self._generator_mul = _GF_MUL[:, generator[1:]]
+        #Row s is s times each root a^i, for evaluating all syndromes together
+        self._root_mul = _GF_MUL[:, _GF_EXP[:nsym]]
+        self._fallback = None
+
+    def _blocks(self, data, size):
+        #Cut into rows of size bytes, the short last block is padded with leading zeros
+        #which doesn't change its remainder or syndromes
+        data = np.frombuffer(bytes(data), dtype=np.uint8)
+        block_count = -(-len(data)//size)
+        blocks = np.zeros((block_count, size), dtype=np.uint8)
+        full = len(data)//size
+        blocks[:full] = data[:full*size].reshape(full, size)
+        tail = len(data) - full*size
+        if(tail):
+            blocks[-1, size-tail:] = data[full*size:]
+        return blocks, tail
+
+    def encode(self, data):
+        data_size = BLOCK_SIZE - self.nsym
+        blocks, tail = self._blocks(data, data_size)
+
+        #Long division by the generator for every block at once, one data byte per step
+        remainder = np.zeros((len(blocks), self.nsym), dtype=np.uint8)
+        for column in range(data_size):
+            feedback = blocks[:, column] ^ remainder[:, 0]
+            remainder[:, :-1] = remainder[:, 1:]
+            remainder[:, -1] = 0
+            remainder ^= self._generator_mul[feedback]
+
+        encoded = np.concatenate((blocks, remainder), axis=1).reshape(-1)
+        if(tail):
+            encoded = np.concatenate((encoded[:-BLOCK_SIZE], encoded[-BLOCK_SIZE+data_size-tail:]))
+        return bytearray(encoded.tobytes())
+
+    def decode(self, data):
+        blocks, tail = self._blocks(data, BLOCK_SIZE)
+
+        #Evaluate every block at every root, all zero means the block is untouched
+        syndromes = np.zeros((len(blocks), self.nsym), dtype=np.uint8)
+        columns = np.arange(self.nsym)
+        for column in range(BLOCK_SIZE):
+            syndromes = self._root_mul[syndromes, columns] ^ blocks[:, column, None]
+        damaged = np.flatnonzero(syndromes.any(axis=1))
+
+        data_size = BLOCK_SIZE - self.nsym
+        decoded = bytearray(blocks[:, :data_size].tobytes())
+        if(len(damaged)):
+            #Only the damaged blocks need the full error locator search
+            if(self._fallback is None):
+                self._fallback = RSCodec(self.nsym)
+            raw = bytes(data)
+            for index in damaged:
+                block = raw[index*BLOCK_SIZE : (index+1)*BLOCK_SIZE]
+                decoded[index*data_size : (index+1)*data_size] = self._fallback.decode(block)[0].rjust(data_size, b"\0")
+
+        if(tail):
+            del decoded[len(decoded)-data_size : len(decoded)-data_size+BLOCK_SIZE-tail]
+        return decoded
+
+
+class ReedsoloCodec:
+    name = "reedsolo"
+
+    def __init__(self, nsym):
+        self.nsym = nsym
+        self._codec = RSCodec(nsym)
+
+    def encode(self, data):
+        return self._codec.encode(bytearray(data))
+
+    def decode(self, data):
+        return self._codec.decode(bytearray(data))[0]
+
+
+class CreedsoloCodec(ReedsoloCodec):
+    name = "creedsolo"
+
+    def __init__(self, nsym):
+        import creedsolo
+        self.nsym = nsym
+        self._codec = creedsolo.RSCodec(nsym)
+
+
+CODECS = {
+    "numpy": NumpyCodec,
+    "creedsolo": CreedsoloCodec,
+    "reedsolo": ReedsoloCodec,
+}
+
+
+def _make_codec(name, nsym):
+    if(name is None):
+        try:
+            return CreedsoloCodec(nsym)
+        except ImportError:
+            name = "numpy"
+    if(name not in CODECS):
+        raise ValueError("Unknown ECC codec %r, expected one of %s" % (name, ", ".join(CODECS)))
+    return CODECS[name](nsym)
+
+
+#One codec per process for pooled work, built on first use
+_worker_codecs = {}
+
+
+def _worker_codec(name, nsym):
+    key = (name, nsym)
+    if(key not in _worker_codecs):
+        _worker_codecs[key] = _make_codec(name, nsym)
+    return _worker_codecs[key]
+
+
+def _run_group(method, name, nsym, data):
+    return getattr(_worker_codec(name, nsym), method)(data)
+
+
+####Block coder####
+class BlockCodec:
+    #Encodes/decodes blocks_per_task blocks at a time, on a pool when workers > 1
+    def __init__(self, nsym=13, codec=None, workers=1, pool="thread", blocks_per_task=512):
+        if(pool not in ("thread", "process")):
+            raise ValueError("pool must be 'thread' or 'process', got %r" % (pool,))
+        self.nsym = nsym
+        self.codec = _make_codec(codec, nsym)
+        self.workers = workers if workers is not None else (os.cpu_count() or 1)
+        self.pool = pool
+        self.blocks_per_task = blocks_per_task
+        self.data_size = BLOCK_SIZE - nsym
+
+    def encoded_length(self, length):
+        return length + self.nsym*(-(-length//self.data_size))
+
+    def encode(self, data):
+        return bytearray().join(self.encode_stream(data))
+
+    def decode(self, data):
+        #Raises ReedSolomonError if any block has too many errors to correct
+        data = bytes(data)
+        step = self.blocks_per_task*BLOCK_SIZE
+        groups = (data[start:start+step] for start in range(0, len(data), step))
+        return bytearray().join(self._map("decode", groups))
+
+    def encode_stream(self, source):
+        #Encoded bytes for source, bytes, a binary file or an iterable of byte strings, a group of
+        #blocks at a time so the whole payload is never held in memory
+        return self._map("encode", self._groups(source, self.blocks_per_task*self.data_size))
+
+    def _groups(self, source, size):
+        #Regroup whatever the source yields into size byte pieces
+        if(isinstance(source, (bytes, bytearray, memoryview))):
+            source = [bytes(source)]
+        elif(hasattr(source, "read")):
+            source = iter(lambda read=source.read: read(size), b"")
+        pending = bytearray()
+        for piece in source:
+            pending += piece
+            while len(pending) >= size:
+                yield bytes(pending[:size])
+                del pending[:size]
+        if(pending):
+            yield bytes(pending)
+
+    def _map(self, method, groups):
+        if(self.workers == 1):
+            for group in groups:
+                yield getattr(self.codec, method)(group)
+            return
+
+        #Keep a bounded number of groups in flight and hand the results back in order
+        executor_type = ThreadPoolExecutor if self.pool == "thread" else ProcessPoolExecutor
+        with executor_type(max_workers=self.workers) as executor:
+            pending = collections.deque()
+            for group in groups:
+                pending.append(executor.submit(_run_group, method, self.codec.name, self.nsym, group))
+                if(len(pending) >= 2*self.workers):
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+
+
+####Selection####
+_codec = None
+
+
+def set_codec(codec=None, **kwargs):
+    #Choose the Reed-Solomon codec and pool used by encode()/decode(), see BlockCodec for options
+    global _codec
+    _codec = BlockCodec(13, codec, **kwargs)
+    return _codec
+
+
+def get_codec():
+    if(_codec is None):
+        return set_codec(os.environ.get("FOURIER_STEG_ECC") or None)
+    return _codec
@@ -0,0 +1,156 @@
+from PIL import Image
+import numpy as np
+import contextlib
+import os
+import tempfile
+
+from . import core, ecc, metrics, pngio, transform
+from . import strength as embed_strength
+from .backends import get_backend
+
+##################Basic breakdown##################
+'''
+Large image mode, for covers too big for the full size float64/complex128
+working set encode() uses:
+
+    large.encode_file("cover.png", payload_file, "stego.png")
+    payload = large.decode_file("stego.png")
+
+The cover is decoded into a np.memmap in a scratch directory and each
+channel is transformed on its own in single precision (float32 pixels,
+complex64 half spectrum), with the half spectra kept in a memmap as well.
+Only the payload band rows are brought into memory in double precision for
+the embedding, exactly as encode() does it, then each channel is inverted in
+place into a memmapped output which is written to the PNG a strip at a time.
+Peak memory is around two float32 planes plus the FFT library's own
+workspace, a few GB for a 16384x16384 cover rather than tens.
+
+Pillow still decodes the cover in one go, which for an 8-bit RGB image is
+the size of the image itself.
+
+Decoding loads the stego image the same way and uses partial decode, which
+works the band rows out directly or, for a wide band, from a single
+precision FFT of one channel at a time, so the full spectrum is never
+built.
+
+Single precision can move a pixel of the stego image by a level compared to
+encode(), the payload is unaffected.
+
+strength="adaptive" works here as it does for encode() but without the read
+back that checks it, "simulate" doesn't as it needs the whole image in
+memory several times over.
+'''
+
+STRIP_ROWS = 256    #Rows copied out of Pillow at a time
+
+
+####Scratch buffers####
+@contextlib.contextmanager
+def _scratch_dir(work_dir):
+    #Memmaps can outlive the function on an exception, so don't fail the cleanup over them
+    with tempfile.TemporaryDirectory(prefix="fourier_steg_", dir=work_dir, ignore_cleanup_errors=True) as scratch:
+        yield scratch
+
+
+def _scratch(scratch, name, shape, dtype):
+    return np.memmap(os.path.join(scratch, name), dtype=dtype, mode="w+", shape=shape)
+
+
+@contextlib.contextmanager
+def _no_pixel_limit():
+    #Pillow refuses images past ~180 megapixels as a decompression bomb guard, big covers are the point here
+    limit = Image.MAX_IMAGE_PIXELS
+    Image.MAX_IMAGE_PIXELS = None
+    try:
+        yield
+    finally:
+        Image.MAX_IMAGE_PIXELS = limit
+
+
+def load_rgb(path, scratch):
+    #Decode an image file into a memmapped (H, W, 3) uint8 array, a strip of rows at a time
+    with _no_pixel_limit(), Image.open(path) as image:
+        if(image.mode != "RGB"):
+            image = image.convert("RGB")
+        column_count, row_count = image.size
+        pixels = _scratch(scratch, os.path.basename(path) + ".rgb", (row_count, column_count, 3), np.uint8)
+        for start in range(0, row_count, STRIP_ROWS):
+            stop = min(start+STRIP_ROWS, row_count)
+            pixels[start:stop] = np.asarray(image.crop((0, start, column_count, stop)))
+        image.close()
+    return pixels
+
+
+def write_png_rows(path, image):
+    #Write an (H, W, 3) uint8 array, memmapped or not, to an 8-bit PNG a strip of rows at a time
+    pngio.write_rows(path, image, 8)
+
+
+####Encode/decode####
+def encode_file(cover_path, payload, output_path, work_dir=None, progress=None, compress=False, strength="heuristic"):
+    #payload is bytes or an open binary file, the stego image is written to output_path
+    if(embed_strength.check(strength) == "simulate"):
+        raise ValueError("Large image mode can't simulate the strength, use strength=\"adaptive\"")
+    with metrics.Run("encode", progress) as run, _scratch_dir(work_dir) as scratch:
+        _encode_file(run, cover_path, payload, output_path, scratch, compress, strength)
+    return output_path
+
+
+def decode_file(stego_path, work_dir=None, strict=False, progress=None):
+    with _scratch_dir(work_dir) as scratch:
+        stego = load_rgb(stego_path, scratch)
+        payload = core._decode_run(stego, None, None, False, True, strict, progress, "double", fft_dtype=np.float32)
+        del stego
+    return payload
+
+
+def _encode_file(run, cover_path, payload, output_path, scratch, compress, strength="heuristic"):
+    run.stage("load")
+    cover = load_rgb(cover_path, scratch)
+    row_count, column_count = cover.shape[:2]
+    half_count = column_count//2 + 1
+
+    #Work out the band before any transforms so a payload that doesn't fit fails straight away
+    codec = ecc.get_codec()
+    length_bits, total_bits, rows_required, payload_size, pieces = core._plan_payload(run, codec, payload, row_count, column_count, compress=compress)
+    band_rows = core._band_rows(rows_required, row_count)
+
+
+    ####Forward transform one channel at a time, keeping only the band rows in memory####
+    run.stage("fft", shape=cover.shape, bytes=cover.nbytes)
+    backend = get_backend()
+    spectrum = _scratch(scratch, "spectrum", (3, row_count, half_count), np.complex64)
+    band_spectrum = np.empty((3, len(band_rows), column_count), dtype=np.complex128)
+    histograms = np.zeros((3, 256), dtype=np.int64)
+    for channel in range(3):
+        spectrum[channel] = backend.rfft2(cover[:, :, channel].astype(np.float32))
+        band_spectrum[channel] = transform.spectrum_rows(spectrum[channel:channel+1], band_rows, column_count)[0]
+        if(strength == "adaptive"):
+            histograms[channel] = np.bincount(cover[:, :, channel].reshape(-1), minlength=256)
+    del cover
+
+
+    run.stage("embed", payload_bytes=payload_size)
+    band_magnitude = np.abs(band_spectrum)
+    image_2d = core._interleave(band_magnitude)
+    run.value(rows_required=rows_required, payload_bits=total_bits, band_bytes=band_spectrum.nbytes)
+    ones, readable = core._band_bits(column_count*3, rows_required, length_bits, pieces, total_bits)
+    additionValue = core._pick_strength(strength, image_2d, band_magnitude, ones, readable, histograms, row_count*column_count)
+    core._embed_band(image_2d, rows_required, ones, additionValue)
+    run.value(additionValue=additionValue)
+    delta = core._edit_delta(image_2d, band_magnitude, band_spectrum)
+
+
+    ####Inverse transform one channel at a time, straight into the memmapped output####
+    run.stage("inverse", shape=spectrum.shape, bytes=spectrum.nbytes)
+    stego = _scratch(scratch, "stego", (row_count, column_count, 3), np.uint8)
+    for channel in range(3):
+        img_plane = transform.inverse_edited(spectrum[channel:channel+1], band_rows, delta[channel:channel+1], overwrite=True)
+        transform.to_image(img_plane, out=stego[:, :, channel:channel+1])
+        del img_plane
+    del spectrum
+
+    run.stage("write", shape=stego.shape, bytes=stego.nbytes)
+    write_png_rows(output_path, stego)
+    del stego
+    core.log.info("Finished...")
@@ -0,0 +1,167 @@
+import cProfile
+import io
+import logging
+import pstats
+import time
+import tracemalloc
+
+##################Basic breakdown##################
+'''
+Per-stage instrumentation for encode()/decode(). Every call is a run made of
+stages ("fft", "embed", ...). When a stage ends an event dict is sent to every
+registered sink:
+
+    {"operation": "encode", "stage": "fft", "seconds": 0.012,
+     "shape": (512, 512, 3), "bytes": 786432}
+
+Values picked along the way (additionValue, HighBitBounday, rows_required...)
+are added to the stage they were found in, and a final "total" event carries
+the whole run. With no sinks registered and profiling off nothing is timed or
+built, so leaving the hooks in place costs nothing.
+
+    metrics.add_sink(metrics.logging_sink())      #Log every stage
+    metrics.add_sink(my_list.append)              #Or collect them yourself
+    metrics.configure(profile=True)               #cProfile each call
+    metrics.configure(trace_memory=True)          #tracemalloc peak per stage
+'''
+
+log = logging.getLogger("fourier_steg.metrics")
+
+_sinks = []
+_profile = False
+_trace_memory = False
+
+
+####Configuration####
+def add_sink(sink):
+    #sink is called with each event dict
+    _sinks.append(sink)
+    return sink
+
+
+def remove_sink(sink):
+    _sinks.remove(sink)
+
+
+def configure(profile=None, trace_memory=None):
+    #Turn the per-call cProfile/tracemalloc hooks on or off, None leaves a setting alone
+    global _profile, _trace_memory
+    if(profile is not None):
+        _profile = profile
+    if(trace_memory is not None):
+        _trace_memory = trace_memory
+
+
+def logging_sink(logger=None, level=logging.INFO):
+    #Sink that logs each event as one line, with the event itself attached as record.fourier_steg
+    logger = logger or log
+
+    def sink(event):
+        details = " ".join(
+            "%s=%s" % (key, value) for key, value in event.items()
+            if key not in ("operation", "stage", "seconds", "profile")
+        )
+        logger.log(level, "%s.%s %.4fs %s", event["operation"], event["stage"], event["seconds"], details,
+                   extra={"fourier_steg": event})
+        if("profile" in event):
+            logger.log(level, "%s profile:\n%s", event["operation"], event["profile"])
+    return sink
+
+
+####Runs####
+class Run:
+    #One encode/decode call, also forwards stage changes to the caller's progress callback
+    def __init__(self, operation, progress=None):
+        self.operation = operation
+        self.progress = progress
+        self.enabled = bool(_sinks) or _profile or _trace_memory
+        if(not self.enabled):
+            return
+
+        self._sinks = list(_sinks)
+        self._stage = None
+        self._totals = {}
+        self._start = time.perf_counter()
+
+        self._profiler = None
+        if(_profile):
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+
+        self._own_tracing = False
+        if(_trace_memory):
+            if(not tracemalloc.is_tracing()):
+                tracemalloc.start()
+                self._own_tracing = True
+            tracemalloc.reset_peak()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, error_type, error, traceback):
+        if(error_type is None):
+            self.finish()
+        else:
+            self._stop_hooks()  #Failed or cancelled, nothing worth reporting
+
+    def stage(self, name, **details):
+        #Start the next stage, ending the current one
+        if(self.progress is not None):
+            self.progress(name)
+        if(not self.enabled):
+            return
+        now = time.perf_counter()
+        self._end_stage(now)
+        self._stage = (name, now, details)
+
+    def value(self, **values):
+        #Attach values to the current stage and to the run total
+        if(not self.enabled):
+            return
+        if(self._stage is not None):
+            self._stage[2].update(values)
+        self._totals.update(values)
+
+    def finish(self):
+        if(not self.enabled):
+            return
+        now = time.perf_counter()
+        self._end_stage(now)
+
+        event = {"operation": self.operation, "stage": "total", "seconds": now - self._start}
+        event.update(self._totals)
+        if(self._profiler is not None):
+            self._profiler.disable()
+            report = io.StringIO()
+            pstats.Stats(self._profiler, stream=report).sort_stats("cumulative").print_stats(15)
+            event["profile"] = report.getvalue()
+        self._stop_hooks()
+        self._emit(event)
+
+    def _stop_hooks(self):
+        if(not self.enabled):
+            return
+        if(self._profiler is not None):
+            self._profiler.disable()
+        if(self._own_tracing):
+            tracemalloc.stop()
+            self._own_tracing = False
+
+    def _end_stage(self, now):
+        if(self._stage is None):
+            return
+        name, start, details = self._stage
+        event = {"operation": self.operation, "stage": name, "seconds": now - start}
+        event.update(details)
+        if(_trace_memory and tracemalloc.is_tracing()):
+            event["peak_traced_bytes"] = tracemalloc.get_traced_memory()[1]
+            tracemalloc.reset_peak()
+        self._stage = None
+        self._emit(event)
+
+    def _emit(self, event):
+        for sink in self._sinks:
+            try:
+                sink(event)
+            except Exception:
+                log.exception("Metrics sink %r failed", sink)   #Never let reporting break a job
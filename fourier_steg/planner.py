@@ -0,0 +1,112 @@
+from PIL import Image
+import collections
+import math
+import os
+
+from .ecc import BLOCK_SIZE
+
+##################Basic breakdown##################
+'''
+How much a cover can hold, worked out from its size alone so no pixels are
+decoded and no FFT is run:
+
+    capacity(1024, 1024)                  #Largest payload in bytes
+    plan("cover.png", len(payload))       #Plan(fits=True, rows_required=..., ...)
+
+The limits are the ones encode()/decode() apply:
+
+ - The payload is Reed-Solomon coded, ecc parity bytes for every 255-ecc
+   payload bytes, and preceded by a 32-bit length header whose top 2 bits
+   are flags
+ - Those bits fill 3*W samples per row, plus 6 rows of margin, and the band
+   is repeated at the bottom so 2*rows_required rows must fit in the height
+ - The decoder only reads payload bits from the top half of the Fourier
+   image, up to sample (H/2)*W*3, starting after the 3 rows of calibration
+'''
+
+HEADER_BITS = 32
+FLAG_BITS = 2       #Top bits of the length header kept for flags, see core
+MARGIN_ROWS = 6     #Extra rows encode() adds against noise/quantization
+
+Plan = collections.namedtuple("Plan", (
+    "fits",                 #Whether encode() can embed it and decode() read it back
+    "payload_bytes",
+    "encoded_bytes",        #After Reed-Solomon coding
+    "payload_bits",         #Encoded bits plus the length header
+    "rows_required",        #Fourier rows used at the top, and again at the bottom
+    "rows_available",       #Height of the cover
+    "max_payload_bytes",    #capacity() of the cover
+    "limit",                #Why it doesn't fit, None if it does
+))
+
+
+####Sizes####
+def image_size(source):
+    #(width, height) of an image file, path or open file, from its header only
+    if(isinstance(source, (tuple, list))):
+        return tuple(source)
+    with Image.open(source) as image:
+        return image.size
+
+
+def encoded_length(length, ecc=13):
+    #Bytes after Reed-Solomon coding with ecc parity bytes per block
+    return length + ecc*math.ceil(length/(BLOCK_SIZE-ecc))
+
+
+def rows_required(payload_bits, column_count):
+    #Fourier rows needed for payload_bits (header included) on a cover W pixels wide
+    return math.ceil((payload_bits/3)/column_count) + MARGIN_ROWS
+
+
+def fit_limit(payload_bits, width, height):
+    #Reason payload_bits can't be carried by a width x height cover, or None
+    if(payload_bits - HEADER_BITS >= 2**(HEADER_BITS-FLAG_BITS)):
+        return "length header overflow"
+    if(2*rows_required(payload_bits, width) > height):
+        return "cover height"
+    payload_start = 3*width*3
+    if(payload_start + payload_bits > int((height/2)*width*3)):
+        return "decoder read limit"
+    return None
+
+
+####Planning####
+def capacity(width, height, ecc=13):
+    #Largest payload in bytes a width x height cover can carry
+    def fits(length):
+        return fit_limit(HEADER_BITS + 8*encoded_length(length, ecc), width, height) is None
+
+    low, high = 0, width*height*3//8
+    if(not fits(low)):
+        return 0    #Too small for even the length header
+    while low < high:
+        middle = (low + high + 1)//2
+        if(fits(middle)):
+            low = middle
+        else:
+            high = middle - 1
+    return low
+
+
+def plan(cover_size, payload_len, ecc=13):
+    #cover_size is (width, height) or an image file to read it from, payload_len can also be a path or bytes
+    width, height = image_size(cover_size)
+    if(isinstance(payload_len, (str, os.PathLike))):
+        payload_len = os.path.getsize(payload_len)
+    elif(not isinstance(payload_len, int)):
+        payload_len = len(payload_len)
+
+    encoded_bytes = encoded_length(payload_len, ecc)
+    payload_bits = HEADER_BITS + 8*encoded_bytes
+    limit = fit_limit(payload_bits, width, height)
+    return Plan(
+        fits=limit is None,
+        payload_bytes=payload_len,
+        encoded_bytes=encoded_bytes,
+        payload_bits=payload_bits,
+        rows_required=rows_required(payload_bits, width),
+        rows_available=height,
+        max_payload_bytes=capacity(width, height, ecc),
+        limit=limit,
+    )
@@ -0,0 +1,138 @@
+from PIL import Image
+import numpy as np
+import contextlib
+import png  #Only for PNGs that need unfiltering
+import struct
+import zlib
+
+##################Basic breakdown##################
+'''
+PNG reading/writing for the stego images and the 48-bit Fourier domain
+dumps, without going through pypng a row at a time:
+
+    write_rgb8(path, image)         #(H, W, 3) uint8, through Pillow
+    image = read_rgb8(path)
+    write_rgb16(path, image_2d)     #(H, W*3) uint16 in RGBRGB... order
+    image_2d = read_rgb16(path)
+
+Pillow can't write 16 bits per sample RGB, so those files are built here:
+the samples are laid out big-endian behind each row's filter byte in a
+strip buffer and handed to zlib a strip at a time, which also lets
+write_rows() stream memory-mapped images. Reading inflates all the image
+data in one go and views it as the sample array when every row uses the
+"none" filter, as ours do, anything else is unfiltered by pypng.
+
+Every writer takes a zlib level, the default is LEVEL. set_level("fast")
+trades file size for speed, which suits throwaway dumps.
+'''
+
+LEVEL = 6           #zlib level used when a writer isn't given one
+FAST_LEVEL = 1
+STRIP_ROWS = 256    #Rows filtered and compressed at a time
+
+_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+_RGB = 2    #PNG colour type
+
+
+def set_level(level):
+    #Default zlib level for every PNG written, 0-9 or "fast"
+    global LEVEL
+    level = FAST_LEVEL if level == "fast" else level
+    if(level not in range(10)):
+        raise ValueError("zlib level must be 0-9 or 'fast', got %r" % (level,))
+    LEVEL = level
+
+
+@contextlib.contextmanager
+def _open(target, mode):
+    #Open a path, or pass an already open file through without closing it
+    if(hasattr(target, "read" if "r" in mode else "write")):
+        yield target
+        return
+    with open(target, mode) as opened:
+        yield opened
+
+
+####Writing####
+def _chunk(kind, data):
+    return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+
+def write_rows(destination, image, bitdepth=8, level=None):
+    #Write an (H, W, 3) or (H, W*3) RGB image, memmapped or not, as an 8 or 16-bit sample PNG
+    #destination is a path or a binary file
+    row_count = image.shape[0]
+    row_length = int(np.prod(image.shape[1:]))
+    sample_type = np.dtype(np.uint8 if bitdepth == 8 else ">u2")
+    header = struct.pack(">IIBBBBB", row_length//3, row_count, bitdepth, _RGB, 0, 0, 0)
+
+    compressor = zlib.compressobj(LEVEL if level is None else level)
+    strip = np.zeros((min(STRIP_ROWS, max(row_count, 1)), 1 + row_length*sample_type.itemsize), dtype=np.uint8)
+    samples = strip[:, 1:].view(sample_type)    #Filter byte stays 0, no filtering
+    with _open(destination, "wb") as fout:
+        fout.write(_SIGNATURE + _chunk(b"IHDR", header))
+        for start in range(0, row_count, len(strip)):
+            stop = min(start+len(strip), row_count)
+            samples[:stop-start] = image[start:stop].reshape(stop-start, row_length)
+            data = compressor.compress(strip[:stop-start])
+            if(data):
+                fout.write(_chunk(b"IDAT", data))
+        fout.write(_chunk(b"IDAT", compressor.flush()) + _chunk(b"IEND", b""))
+
+
+def write_rgb16(destination, image_2d, level=None):
+    #(H, W*3) samples in RGBRGB... order, as a 48-bit PNG
+    write_rows(destination, image_2d, 16, level)
+
+
+def write_rgb8(destination, image, level=None):
+    #(H, W, 3) uint8 image as a 24-bit PNG
+    Image.fromarray(np.ascontiguousarray(image, dtype=np.uint8), "RGB").save(
+        destination, format="PNG", compress_level=LEVEL if level is None else level
+    )
+
+
+####Reading####
+def read_rgb8(source):
+    #Any image Pillow can open, as an (H, W, 3) uint8 array
+    with Image.open(source) as image:
+        return np.asarray(image.convert("RGB") if image.mode != "RGB" else image)
+
+
+def read_rgb16(source):
+    #A 16-bit sample RGB PNG as an (H, W*3) uint16 array in RGBRGB... order
+    with _open(source, "rb") as fin:
+        data = fin.read()
+    if(data[:8] != _SIGNATURE):
+        raise ValueError("Not a PNG file")
+
+    header = None
+    idat = []
+    position = 8
+    while position < len(data):
+        length, kind = struct.unpack_from(">I4s", data, position)
+        body = data[position+8 : position+8+length]
+        if(kind == b"IHDR"):
+            header = struct.unpack(">IIBBBBB", body)
+        elif(kind == b"IDAT"):
+            idat.append(body)
+        elif(kind == b"IEND"):
+            break
+        position += 12 + length
+    if(header is None):
+        raise ValueError("PNG file has no IHDR chunk")
+
+    column_count, row_count, bitdepth, colour, _, _, interlace = header
+    if(bitdepth != 16 or colour != _RGB):
+        raise ValueError("Expected a 16-bit RGB PNG, got %d-bit colour type %d" % (bitdepth, colour))
+
+    if(not interlace):
+        raw = np.frombuffer(zlib.decompress(b"".join(idat)), dtype=np.uint8)
+        rows = raw.reshape(row_count, 1 + column_count*6)
+        if(not rows[:, 0].any()):
+            #Unfiltered, the samples can be taken straight out of the inflated data
+            return rows[:, 1:].view(">u2").astype(np.uint16)
+
+    #Filtered or interlaced, written by something else
+    _, _, pixels, _ = png.Reader(bytes=data).read_flat()
+    return np.frombuffer(pixels, dtype=np.uint16).reshape(row_count, column_count*3)
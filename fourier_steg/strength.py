@@ -0,0 +1,274 @@
+import numpy as np
+import logging
+import math
+import numbers
+
+from . import container, ecc, planner, transform
+
+##################Basic breakdown##################
+'''
+Choosing additionValue, how much each 1 bit adds to its Fourier magnitude.
+The original value scales the mean magnitude of 40 samples in the middle of
+the top row by constants tuned by hand, which gives flat covers too little
+to survive being written as uint8 and busy covers far more than they need:
+
+    stego = encode(cover, payload)                          #"heuristic", the original value
+    stego = encode(cover, payload, strength="adaptive")     #Estimated from the payload band
+    stego = encode(cover, payload, strength="simulate")     #Estimated, then round tripped
+    stego = encode(cover, payload, strength=6000)           #Fixed
+
+"adaptive" models what rounding and clipping the stego image does to the
+band. Both act on the whole image, so for the band they're a gain below 1 on
+the edits plus noise: the 1s come back scaled by the gain and (1 - gain) of
+whatever was blanked comes back in every 0. The gain and noise come from the
+cover's histogram and the spread the edits give each pixel, and the blanked
+content is taken as the NOISE_PERCENTILE percentile of the band magnitudes
+under the 1s and under the 0s. Every candidate strength is worked out at once
+and the smallest whose weakest 1 clears the strongest 0 by ESTIMATE_MARGIN
+quantized levels wins.
+
+"simulate" starts from that estimate and does the uint8 round trip for real.
+Before rounding the stego image is linear in the strength, so two inverse
+transforms give it for any strength. Each try rounds and clips that, reads
+back only the payload rows and compares them with the threshold decode()
+takes from the calibration row. The smallest strength that reads back clean
+is found within MAX_SIMULATIONS tries: no bit on the wrong side of that
+threshold, or so few that no Reed-Solomon block has more wrong bytes than
+ECC_SHARE of what it can correct.
+
+encode(..., verify=True) reads the payload rows of the finished uint8 image
+back the same way, whatever the strength, so the image never needs decoding
+to check it. If that isn't clean the same search runs from the estimate,
+knowing how the first strength read back. "adaptive" always verifies, as
+the model can fall short on covers with no texture at all, except in large
+image mode where the search can't run.
+'''
+
+log = logging.getLogger("fourier_steg")
+
+STRENGTHS = ("heuristic", "adaptive", "simulate")
+
+MARGIN = 1              #Quantized levels the estimate settles for between the weakest 1 and strongest 0
+ESTIMATE_MARGIN = 2     #The estimate isn't checked so it aims for another level
+NOISE_PERCENTILE = 99.9 #Of the band magnitudes, taken as the floor the blanked content comes back at
+IN_BAND_DISTORTION = 0.1    #Share of the clipping distortion that lands in the band, measured on test covers
+STEPS_PER_OCTAVE = 8    #Candidate strengths tried by the estimate
+MAX_SIMULATIONS = 8
+TOLERANCE = 0.05        #Simulation stops once the smallest passing strength is known to this fraction
+DIRECT_ROWS = 16        #Payload rows read back with a direct DFT, past this one forward FFT is quicker
+ECC_SHARE = 0.5         #Of the bytes a Reed-Solomon block can correct, wrong ones a clean read back may leave
+UNCODED_BITS = planner.HEADER_BITS + container.INDEX_SIZE_BITS  #Length header and container index size, no ECC
+
+_NODES, _WEIGHTS = np.polynomial.hermite_e.hermegauss(32)   #Expectations over a unit Gaussian
+_WEIGHTS = _WEIGHTS/_WEIGHTS.sum()
+_erf = np.frompyfunc(math.erf, 1, 1)
+
+
+def check(strength):
+    #A strength name or a fixed positive additionValue, raises ValueError for anything else
+    if(isinstance(strength, str)):
+        if(strength not in STRENGTHS):
+            raise ValueError("Unknown strength %r, expected one of %s or a number" % (strength, ", ".join(STRENGTHS)))
+        return strength
+    if(isinstance(strength, numbers.Real) and not isinstance(strength, bool) and strength > 0):
+        return strength
+    raise ValueError("Strength must be one of %s or a positive number, got %r" % (", ".join(STRENGTHS), strength))
+
+
+def heuristic(image_2d):
+    #image_2d is the interleaved band magnitude before it's blanked
+    #Find a suitable value to encode our payload with compared to the noise around middle where it's likely to be the largest:
+    row_length = image_2d.shape[1]
+    middle = math.floor(row_length/2)
+    maximumImageValue = (np.mean(image_2d[0][middle-20:middle+20]))
+    return math.ceil(3.68*maximumImageValue + 13)  #Empirically tested values
+
+
+def histograms(image):
+    #(3, 256) pixel counts of each channel of an (H, W, 3) uint8 image
+    return np.stack([np.bincount(image[:, :, channel].reshape(-1), minlength=256) for channel in range(3)])
+
+
+####Estimate####
+def _rounding(spread):
+    #Gain and distortion variance of rounding an integer plus Gaussian noise of the given spread
+    #Past a few levels it's the usual uniform rounding noise
+    spread = np.maximum(spread, 1e-9)
+    steps = np.arange(-49, 50)
+    low = (steps - 0.5)/spread[..., None]
+    high = (steps + 0.5)/spread[..., None]
+    probability = (_erf(high/math.sqrt(2)) - _erf(low/math.sqrt(2))).astype(float)/2
+    density = (np.exp(-low**2/2) - np.exp(-high**2/2))/math.sqrt(2*math.pi)
+    gain = (steps*density).sum(-1)/spread
+    variance = np.maximum((steps**2*probability).sum(-1) - gain**2*spread**2, 0)
+    wide = spread > 8
+    return np.where(wide, 1, gain), np.where(wide, 1/12, variance)
+
+
+def estimate(histograms, band_magnitude, ones, readable, pixel_count):
+    #Smallest strength the model says survives the uint8 round trip
+    #band_magnitude is the (3, rows, W) band before blanking, ones and readable are masks of the same
+    #shape for the samples carrying a 1 and every sample decode() compares with its threshold
+    zeros = readable & ~ones
+    to_levels = 255/pixel_count    #Magnitude to the 16-bit levels decode() reads
+
+    #Blanked content under the 1s and 0s, per channel
+    floors = np.nanpercentile(np.where(np.stack((ones, zeros)), band_magnitude, np.nan), NOISE_PERCENTILE, axis=(2, 3))*to_levels
+    one_count = ones.sum(axis=(1, 2))
+
+    #Pixels of each channel as a centre the blanking pulls them towards and a Gaussian spread around it
+    hist = histograms/histograms.sum(axis=1, keepdims=True)
+    values = np.arange(256.0)
+    mean = (hist*values).sum(axis=1, keepdims=True)
+    variance = (hist*(values - mean)**2).sum(axis=1)
+    blanked = (band_magnitude**2).sum(axis=(1, 2))/pixel_count**2   #Per pixel variance the blanking removes
+    share = np.clip(blanked/np.maximum(variance, 1e-12), 0, 1)
+    centre = mean + (values - mean)*(1 - share[:, None])
+
+    #Candidates as the level a 1 reads back at, a 1 adds half the strength to its coefficient
+    levels = 2.0**(np.arange(-STEPS_PER_OCTAVE, 12*STEPS_PER_OCTAVE+1)/STEPS_PER_OCTAVE)
+    strengths = 2*levels/to_levels
+    spread = np.sqrt(blanked*(1 - share))[:, None]
+    spread = np.sqrt(spread**2 + one_count[:, None]*strengths**2/(2*pixel_count**2))   #(3, candidates)
+
+    #Clipping (with abs below 0, as transform.to_image does it) split into a gain and uncorrelated distortion
+    offsets = spread[..., None, None]*_NODES
+    clipped = np.clip(np.abs(centre[:, None, :, None] + offsets), 0, 255)
+    first = (clipped*_WEIGHTS).sum(-1)
+    gain = ((clipped*offsets*_WEIGHTS).sum(-1)*hist[:, None]).sum(-1)/spread**2
+    distortion = (((clipped**2*_WEIGHTS).sum(-1) - first**2)*hist[:, None]).sum(-1) - gain**2*spread**2
+    rounding_gain, rounding_noise = _rounding(spread)
+    gain = gain*rounding_gain
+    noise = np.sqrt((rounding_noise + IN_BAND_DISTORTION*np.maximum(distortion, 0))/(2*pixel_count))*255
+
+    #Gaussian tails for the weakest of the 1s and strongest of the 0s
+    one_tail = math.sqrt(2*math.log(max(ones.sum(), 2)))
+    zero_tail = math.sqrt(2*math.log(max(zeros.sum(), 2)))
+    weakest = (gain*levels - abs(1 - gain)*floors[0][:, None] - noise*one_tail).min(axis=0)
+    strongest = (abs(1 - gain)*floors[1][:, None] + noise*zero_tail).max(axis=0)
+
+    #Past the first peak above 0 more strength mostly buys more clipping, which the model is least sure of, so stop there
+    margins = weakest - strongest
+    falling = np.flatnonzero((np.diff(margins) < 0) & (margins[:-1] > 0))
+    stop = falling[0] + 1 if len(falling) else len(levels)
+    weakest, strongest = weakest[:stop], strongest[:stop]
+
+    #Both are read back floored to whole levels, aim for ESTIMATE_MARGIN however they round, then settle for MARGIN
+    for passing in (weakest - strongest >= ESTIMATE_MARGIN + 1, np.floor(weakest) - np.floor(strongest) >= MARGIN):
+        if(passing.any()):
+            return math.ceil(strengths[np.argmax(passing)])
+    best = int(np.argmax(weakest - strongest))
+    log.warning("No strength clears the band's noise floor, using the closest (%d)", math.ceil(strengths[best]))
+    return math.ceil(strengths[best])
+
+
+####Simulation####
+def read_back(stego, ones, readable):
+    #(bit errors, margin, block errors) reading the payload rows of a uint8 stego image the way decode() does
+    #ones and readable are flat masks over the interleaved band, margin is the gap in levels
+    #between the weakest 1 and the strongest 0, block errors see _block_errors()
+    row_count, column_count = stego.shape[:2]
+    row_length = column_count*3
+    stop = -(-(np.flatnonzero(readable)[-1] + 1)//row_length)
+    rows = np.arange(2, stop)
+
+    if(len(rows) <= DIRECT_ROWS):
+        mag_planes = transform.magnitude_rows(stego, rows)
+    else:
+        mag_planes = np.abs(transform.spectrum_rows(transform.forward(stego), rows, column_count))
+    levels = np.moveaxis(np.uint16(255*(mag_planes/(column_count*row_count))), 0, -1).reshape(-1)
+
+    ones = ones[2*row_length : stop*row_length]
+    readable = readable[2*row_length : stop*row_length]
+    threshold = levels[:row_length][ones[:row_length]].min()    #Calibration row
+    data = np.arange(len(levels)) >= row_length
+    wrong = np.flatnonzero(data & readable & (ones != (levels >= threshold))) - row_length   #From the length header on
+    margin = int(levels[ones].min()) - int(levels[readable & ~ones].max())
+    return len(wrong), margin, _block_errors(wrong)
+
+
+def _block_errors(wrong):
+    #Most wrong bytes any Reed-Solomon block could hold, for bit positions counted from the length header
+    #Blocks can start anywhere (each payload of a container starts its own), so any BLOCK_SIZE bytes in a row
+    #count. Nothing corrects the header or a container's index size, a wrong bit there is never fixed
+    if(len(wrong) == 0):
+        return 0
+    if(wrong[0] < UNCODED_BITS):
+        return math.inf
+    wrong_bytes = np.unique((wrong - planner.HEADER_BITS)//8)
+    return int((np.searchsorted(wrong_bytes, wrong_bytes + ecc.BLOCK_SIZE) - np.arange(len(wrong_bytes))).max())
+
+
+def clean(reading):
+    #Whether decode() gets the payload back from a read_back() with room to spare
+    errors, margin, block_errors = reading
+    return errors == 0 or block_errors <= ECC_SHARE*(ecc.get_codec().nsym//2)
+
+
+def _rank(reading):
+    #Fewer wrong bits first, then the wider margin
+    errors, margin, block_errors = reading
+    return -errors, margin
+
+
+class RoundTrip:
+    #Stego image for any strength from two inverse transforms, the float image is linear in the strength
+    def __init__(self, spectrum, band_rows, blank_delta, ones_delta, ones, readable):
+        self.blank = transform.inverse_edited(spectrum, band_rows, blank_delta)
+        self.per_unit = transform.inverse_edited(np.zeros_like(spectrum), band_rows, ones_delta, overwrite=True)
+        self.ones = ones
+        self.readable = readable
+
+    def image(self, additionValue):
+        return transform.to_image(self.blank + additionValue*self.per_unit)
+
+    def read(self, additionValue):
+        return read_back(self.image(additionValue), self.ones, self.readable)
+
+
+def search(read_at, start, known=None):
+    #(strength, reading) for the smallest strength whose read_at() reading is clean, from a first guess
+    #known maps strengths already read back to their readings, they're taken into account but not read again
+    #Returns the best one read if none is clean within MAX_SIMULATIONS
+    tried = dict(known or {})
+    budget = len(tried) + MAX_SIMULATIONS
+
+    def passes(value):
+        if(value not in tried):
+            tried[value] = read_at(value)
+        return clean(tried[value])
+
+    #Find one that passes, doubling from the guess then halving from it once doubling stops helping
+    #(clipping keeps the same bits wrong), and giving up once halving stops helping too
+    start = value = max(int(start), 1)
+    previous, step = None, 2
+    while not passes(value):
+        if(previous is not None and _rank(tried[value]) <= _rank(tried[previous])):
+            if(step != 2):
+                break
+            step, value = 0.5, start
+        previous, value = value, max(int(value*step), 1)
+        if(value == previous or len(tried) >= budget):
+            break
+    else:
+        #Then bisect down towards the strongest one that fails
+        passing = value
+        failing = max((value for value in tried if value < passing and not clean(tried[value])), default=None)
+        while len(tried) < budget:
+            if(failing is None):
+                value = max(passing//2, 1)
+            elif(passing - failing <= max(TOLERANCE*passing, 1)):
+                break
+            else:
+                value = (passing + failing)//2
+            if(value in tried):
+                break
+            if(passes(value)):
+                passing = value
+            else:
+                failing = value
+        return passing, tried[passing]
+
+    best = max(tried, key=lambda value: _rank(tried[value]))
+    log.warning("No strength read back cleanly, using the best found (%d, %d bit errors, margin %d)", best, *tried[best][:2])
+    return best, tried[best]
@@ -0,0 +1,78 @@
+import functools
+import numpy as np
+
+##################Basic breakdown##################
+'''
+Tone curves for the Fourier domain dumps. The magnitudes are already
+quantized to 16-bit levels before they're written, so any curve is a
+65536 entry lookup table and mapping a whole dump is one np.take:
+
+    apply(image_2d, "log")                  #What "Log scaling?" has always done
+    apply(image_2d, "sqrt")
+    apply(image_2d, ("gamma", 1.8))
+    apply(image_2d, ("percentile", (1, 99)))
+
+log, sqrt and gamma tables are built once and cached. percentile stretches
+the levels between two percentiles of the image to the full 16-bit range,
+its table comes from a histogram of the image so it's built on every call,
+still without any per-sample float maths.
+
+encode()/decode() take any of these in place of logarithmic=True.
+'''
+
+CURVES = ("log", "sqrt", "gamma", "percentile")
+DEFAULT_GAMMA = 2.2
+DEFAULT_PERCENTILES = (1, 99)
+
+_LEVELS = np.arange(65536, dtype=np.uint16)
+
+
+def _parse(curve):
+    #"name" or (name, argument) -> (name, argument)
+    name, argument = (curve, None) if isinstance(curve, str) else curve
+    if(name not in CURVES):
+        raise ValueError("Unknown tone curve %r, expected one of %s" % (name, ", ".join(CURVES)))
+    if(argument is None):
+        argument = {"gamma": DEFAULT_GAMMA, "percentile": DEFAULT_PERCENTILES}.get(name)
+    return name, (tuple(argument) if name == "percentile" else argument)
+
+
+@functools.lru_cache(maxsize=16)
+def _fixed_lut(name, argument):
+    if(name == "log"):
+        #Exactly the original per-sample formula, 65535+1 wraps to 0 in uint16 and clips to 0 the same way
+        with np.errstate(divide="ignore"):
+            levels = np.round(np.log(_LEVELS+1))*9000
+    elif(name == "sqrt"):
+        levels = np.sqrt(_LEVELS)*256
+    else:
+        levels = 65535*(_LEVELS/65535)**(1/argument)
+    lut = np.uint16(np.clip(levels, 0, 65535))
+    lut.setflags(write=False)
+    return lut
+
+
+def _percentile_lut(image, low, high):
+    #Levels at the two percentiles from a histogram of the image, then a straight line between them
+    cumulative = np.cumsum(np.bincount(image.reshape(-1), minlength=65536))
+    black, white = np.searchsorted(cumulative, cumulative[-1]*np.array([low, high])/100)
+    white = max(white, black+1)
+    return np.uint16(np.clip(np.round((_LEVELS - float(black))*(65535/(white - black))), 0, 65535))
+
+
+def lut(curve, image=None):
+    #The 65536 entry table for curve, percentile needs the image it'll be applied to
+    name, argument = _parse(curve)
+    if(name == "percentile"):
+        if(image is None):
+            raise ValueError("The percentile curve needs the image to build its table")
+        return _percentile_lut(image, *argument)
+    return _fixed_lut(name, argument)
+
+
+def apply(image, curve):
+    #uint16 image through a tone curve, same shape out
+    image = np.asarray(image)
+    if(image.dtype != np.uint16):
+        raise ValueError("Tone curves map 16-bit levels, got %s" % image.dtype)
+    return np.take(lut(curve, image), image)
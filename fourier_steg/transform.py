@@ -0,0 +1,158 @@
+import numpy as np
+
+from .backends import get_backend
+
+##################Basic breakdown##################
+'''
+All three channels are transformed together as one (3, H, W) stack with a
+real-input FFT. Images are real so their spectrum is Hermitian,
+X[k1, k2] = conj(X[-k1, -k2]), and only the first W//2+1 columns need to be
+computed. The rest of the spectrum is recovered by mirroring when the full
+shifted magnitude/phase layout is needed (dumps, embedding, reading).
+The FFTs themselves run on whichever backend is selected in backends.
+
+When only a few rows of the shifted layout are wanted (the decoder's payload
+band) those frequency rows are worked out with a direct DFT down the image
+columns, and only they get an FFT along the rows. That costs O(rows*H*W)
+and never holds a full spectrum in memory. Past a few dozen rows an FFT of
+one channel at a time (channel_spectrum()) is quicker and still only holds
+a third of the spectrum.
+
+Passing dtype=np.float32 to forward()/magnitude_rows() works the whole chain
+in single precision (complex64 spectra, float32 magnitudes and planes) for
+half the memory traffic.
+'''
+
+
+####Helpers####
+def _mirror_rows(half):
+    #Index -k1 along the row axis, so row 0 stays put and the rest reverse
+    return np.roll(half[..., ::-1, :], 1, axis=-2)
+
+
+def _expand(half, column_count, conjugate):
+    #Rebuild all W columns of an unshifted plane from its first W//2+1 columns
+    full = np.empty(half.shape[:-1] + (column_count,), dtype=half.dtype)
+    half_count = half.shape[-1]
+    full[..., :half_count] = half
+
+    #Column k2 > W//2 is column W-k2 of the half spectrum, at row -k1
+    tail = _mirror_rows(half[..., 1:column_count-half_count+1][..., ::-1])
+    full[..., half_count:] = conjugate(tail)
+    return full
+
+
+####Transforms####
+def forward(image, dtype=None):
+    #(H, W, 3) image -> (3, H, W//2+1) half spectrum of each channel in one batched FFT
+    #dtype=np.float32 gives a complex64 spectrum, the default is double precision
+    planes = np.moveaxis(np.asarray(image), -1, 0)
+    if(dtype is not None):
+        planes = planes.astype(dtype)
+    return get_backend().rfft2(planes, axes=(-2, -1))
+
+
+def channel_spectrum(image, channel, dtype=np.float64):
+    #(1, H, W//2+1) half spectrum of one channel of an (H, W, 3) image, shaped for spectrum_rows()
+    return get_backend().rfft2(np.asarray(image)[:, :, channel].astype(dtype))[None]
+
+
+def magnitude(spectrum, column_count):
+    #Shifted (3, H, W) magnitude planes, same layout as abs(fftshift(fft2(channel)))
+    return np.fft.fftshift(_expand(np.abs(spectrum), column_count, lambda tail: tail), axes=(-2, -1))
+
+
+def phase(spectrum, column_count):
+    #Shifted (3, H, W) phase planes, same layout as angle(fftshift(fft2(channel)))
+    return np.fft.fftshift(_expand(np.angle(spectrum), column_count, np.negative), axes=(-2, -1))
+
+
+def magnitude_phase(spectrum, column_count):
+    return magnitude(spectrum, column_count), phase(spectrum, column_count)
+
+
+def magnitude_rows(image, rows, block_rows=512, dtype=np.float64):
+    #Shifted (3, len(rows), W) magnitude of just the given rows of the shifted layout
+    image = np.asarray(image)
+    row_count, column_count = image.shape[:2]
+    k1 = (np.asarray(rows) - row_count//2) % row_count
+    complex_dtype = np.result_type(dtype, np.complex64)
+
+    #DFT down the columns for the wanted frequency rows only, a block of image rows at a time
+    #Works on the (H, W*3) interleaved samples so all channels go through one matrix product
+    column_spectrum = np.zeros((len(k1), column_count*3), dtype=complex_dtype)
+    for start in range(0, row_count, block_rows):
+        n = np.arange(start, min(start+block_rows, row_count))
+        twiddle = np.exp(-2j*np.pi*((k1[:, None]*n[None, :]) % row_count)/row_count).astype(complex_dtype)
+        column_spectrum += twiddle @ image[n[0]:n[-1]+1].reshape(len(n), -1).astype(dtype)
+
+    #Then the FFT along the rows, which is now tiny
+    column_spectrum = column_spectrum.reshape(len(k1), column_count, 3)
+    row_spectrum = get_backend().fft(column_spectrum, axis=1)
+    return np.moveaxis(np.abs(np.fft.fftshift(row_spectrum, axes=1)), -1, 0)
+
+
+def spectrum_rows(spectrum, rows, column_count):
+    #Shifted (3, len(rows), W) complex rows of the full spectrum, rebuilt from the half spectrum
+    row_count, half_count = spectrum.shape[-2:]
+    k1 = (np.asarray(rows) - row_count//2) % row_count
+
+    full = np.empty(spectrum.shape[:-2] + (len(k1), column_count), dtype=spectrum.dtype)
+    full[..., :half_count] = spectrum[..., k1, :]
+    full[..., half_count:] = np.conj(spectrum[..., (-k1) % row_count, 1:column_count-half_count+1][..., ::-1])
+    return np.fft.fftshift(full, axes=-1)
+
+
+def inverse(fshift):
+    #Real part of ifft2(ifftshift(fshift)) for a (3, H, W) stack of shifted spectra
+    #Only the Hermitian part of an edited spectrum survives into the real image, so fold
+    #the spectrum onto itself and let irfft2 do the rest with half the work
+    row_count, column_count = fshift.shape[-2:]
+    full = np.fft.ifftshift(fshift, axes=(-2, -1))
+    half_count = column_count//2 + 1
+
+    rows = (-np.arange(row_count)) % row_count
+    columns = (-np.arange(half_count)) % column_count
+    mirrored = full[..., rows[:, None], columns[None, :]]
+    half = (full[..., :half_count] + np.conj(mirrored))/2
+
+    return get_backend().irfft2(half, s=(row_count, column_count), axes=(-2, -1))
+
+
+def inverse_edited(spectrum, rows, delta, overwrite=False):
+    #Same result as inverse() on the full spectrum with delta (3, len(rows), W) added to the
+    #given rows of the shifted layout, but only the edited coefficients are touched
+    #Half of each edit goes on the coefficient itself and half, conjugated, on its mirror -k,
+    #which is the part of it that survives into a real image
+    row_count, half_count = spectrum.shape[-2:]
+    column_count = delta.shape[-1]
+    half = spectrum if overwrite else spectrum.copy()
+
+    k1 = ((np.asarray(rows) - row_count//2) % row_count)[:, None]
+    k2 = ((np.arange(column_count) - column_count//2) % column_count)[None, :]
+    k1, k2 = np.broadcast_arrays(k1, k2)
+
+    stored = k2 < half_count
+    np.add.at(half, (slice(None), k1[stored], k2[stored]), delta[:, stored]/2)
+
+    mirror_k1 = (-k1) % row_count
+    mirror_k2 = (-k2) % column_count
+    stored = mirror_k2 < half_count
+    np.add.at(half, (slice(None), mirror_k1[stored], mirror_k2[stored]), np.conj(delta[:, stored])/2)
+
+    return get_backend().irfft2(half, s=(row_count, column_count), axes=(-2, -1))
+
+
+def to_image(planes, out=None):
+    #(3, H, W) inverse transform result -> (H, W, 3) uint8 image, written into out if given
+    #We need to manually round each pixel and limit it's range to 0-255 here before casting to uint8
+    #Otherwise due to quantization errors it could be outside the range
+    #Works in place on planes so no full size temporaries are made
+    if(out is None):
+        out = np.empty(planes.shape[1:] + (planes.shape[0],), dtype=np.uint8)
+    for channel, plane in enumerate(planes):
+        np.abs(plane, out=plane)
+        np.round(plane, out=plane)
+        np.clip(plane, 0, 255, out=plane)
+        out[:, :, channel] = plane
+    return out